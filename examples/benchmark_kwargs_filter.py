@@ -0,0 +1,42 @@
+"""micro-benchmark for the plugin kwargs filter used on every TTS / solver call
+
+compares introspecting the plugin signature on every call against the
+cached filter in ovos_plugin_manager.utils
+"""
+import inspect
+import timeit
+
+from ovos_plugin_manager.utils import filter_kwargs
+
+
+class DummyTTS:
+    def get_tts(self, sentence, wav_file, lang=None, voice=None):
+        return wav_file, None
+
+
+tts = DummyTTS()
+kwargs = {"lang": "en-US", "voice": "default", "message": None}
+N = 100_000
+
+
+def uncached():
+    return {k: v for k, v in kwargs.items()
+            if k in inspect.signature(tts.get_tts).parameters
+            and k not in ["sentence", "wav_file"]}
+
+
+def cached():
+    return filter_kwargs(tts.get_tts, kwargs, exclude=("sentence", "wav_file"))
+
+
+assert uncached() == cached()
+t_uncached = timeit.timeit(uncached, number=N)
+t_cached = timeit.timeit(cached, number=N)
+print(f"inspect.signature per call: {t_uncached / N * 1e6:.2f} us/call")
+print(f"cached kwargs filter:       {t_cached / N * 1e6:.2f} us/call")
+print(f"speedup: {t_uncached / t_cached:.1f}x")
+"""
+inspect.signature per call: 107.95 us/call
+cached kwargs filter:       2.03 us/call
+speedup: 53.2x
+"""
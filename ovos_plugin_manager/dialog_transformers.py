@@ -1,6 +1,12 @@
+import hashlib
+from copy import deepcopy
+from typing import List, Optional, Tuple
+
 from ovos_plugin_manager.templates.transformers import DialogTransformer, TTSTransformer
 from ovos_plugin_manager.utils import PluginTypes
 from ovos_plugin_manager.utils import load_plugin, find_plugins
+from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+from ovos_utils.log import LOG
 
 
 def find_dialog_transformer_plugins() -> dict:
@@ -39,3 +45,58 @@ def load_tts_transformer_plugin(module_name: str) -> type(TTSTransformer):
         class: found dialog_transformer plugin class
     """
     return load_plugin(module_name, PluginTypes.TTS_TRANSFORMER)
+
+
+def get_tts_transformers_chain_id(transformers: List[TTSTransformer]) -> Optional[str]:
+    """
+    Get an identifier for an ordered chain of TTS transformers
+    @param transformers: TTSTransformer instances in the order they are applied
+    @return: hash of every transformer name, version and config,
+        None if there are no transformers or any of them is not cacheable
+    """
+    if not transformers or not all(t.cacheable for t in transformers):
+        return None
+    key = "|".join(t.cache_key for t in transformers)
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def transform_tts_audio(transformers: List[TTSTransformer], wav_file: str,
+                        context: dict = None, cache: TextToSpeechCache = None,
+                        sentence_hash: str = None) -> Tuple[str, dict]:
+    """
+    Apply a chain of TTS transformers to a wav file, reusing cached output
+    @param transformers: TTSTransformer instances in the order they are applied
+    @param wav_file: path to audio generated in TTS stage
+    @param context: message context passed to the transformers
+    @param cache: TTS cache the audio belongs to, if any
+    @param sentence_hash: hash of the synthesized sentence, used as cache key
+    @return: path to transformed audio for playback, updated context
+    """
+    context = context or {}
+    chain_id = None
+    if cache is not None and sentence_hash:
+        chain_id = get_tts_transformers_chain_id(transformers)
+    if chain_id:
+        cached = cache.get_transformed(sentence_hash, chain_id)
+        if cached is not None:
+            audio_file, cached_context = cached
+            context.update(cached_context)
+            return str(audio_file), context
+
+    # only what the chain adds or changes is cached, the rest of the
+    # context (session, source, destination...) belongs to this request
+    original = deepcopy(context) if chain_id else None
+    failed = False
+    for transformer in transformers:
+        try:
+            wav_file, context = transformer.transform(wav_file, context)
+        except Exception as e:
+            failed = True
+            LOG.exception(f"{transformer.name} transform failed: {e}")
+
+    if chain_id and not failed:
+        changes = {k: v for k, v in context.items()
+                   if k not in original or original[k] != v}
+        wav_file = str(cache.cache_transformed(sentence_hash, chain_id,
+                                               wav_file, changes))
+    return wav_file, context
@@ -1,3 +1,10 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from queue import Queue
+from threading import Lock
+from typing import List, Optional, Tuple
+
 from ovos_plugin_manager.utils import normalize_lang, \
     PluginTypes, PluginConfigTypes
 from ovos_config import Configuration
@@ -5,6 +12,8 @@ from ovos_plugin_manager.utils.config import get_valid_plugin_configs, \
     sort_plugin_configs, get_plugin_config
 from ovos_utils.log import LOG
 from ovos_plugin_manager.templates.stt import STT, StreamingSTT, StreamThread
+from ovos_plugin_manager.utils.audio import AudioData
+from ovos_plugin_manager.utils.hedging import HedgedRequest
 
 
 def find_stt_plugins() -> dict:
@@ -121,3 +130,183 @@ class OVOSSTTFactory:
         except Exception:
             LOG.exception('The selected STT plugin could not be loaded!')
             raise
+
+    @staticmethod
+    def create_hedged(config=None):
+        """Factory method to create a STT engine with runtime failover.
+
+        If the configured module is slower than usual, the "fallback_module" is
+        queried too and the first answer is used, a circuit breaker sends requests
+        straight to the fallback while the main module is degraded.
+
+        "stt": {
+            "module": <engine_name>,
+            "fallback_module": <engine_name>,
+            "hedge": {"percentile": 95, "failure_threshold": 5, "reset_timeout": 30}
+        }
+        """
+        base = config or Configuration()
+        section = base.get("stt") or base
+        primary = OVOSSTTFactory.create(config)
+        fallback_module = section.get("fallback_module")
+        if not fallback_module or fallback_module == section.get("module"):
+            return primary
+        fallback = OVOSSTTFactory.create(get_stt_config(config, fallback_module))
+        return HedgedSTT(primary, fallback, section.get("hedge") or {})
+
+    @staticmethod
+    def create_pool(config=None, workers: int = 2, use_processes: bool = False) -> "STTWorkerPool":
+        """Factory method to create a pool of STT engines based on configuration.
+
+        Each worker holds its own plugin instance, so plugins that are not
+        thread safe can serve several sessions at once
+        """
+        return STTWorkerPool(get_stt_config(config), workers, use_processes)
+
+
+# plugin instance of a STTWorkerPool process
+_POOL_STT: Optional[STT] = None
+
+
+def _init_pool_process(config: dict, clazz: Optional[type] = None):
+    global _POOL_STT
+    _POOL_STT = clazz(config) if clazz else OVOSSTTFactory.create(config)
+
+
+def _pool_process_transcribe(shm_name: str, size: int, sample_rate: int,
+                             sample_width: int, lang: Optional[str]):
+    """transcribe audio passed through shared memory, returns (result, start, end)"""
+    start = time.time()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        audio = AudioData(bytes(shm.buf[:size]), sample_rate, sample_width)
+    finally:
+        shm.close()
+    result = _POOL_STT.transcribe(audio, lang)
+    return result, start, time.time()
+
+
+class STTWorkerPool:
+    """Pool of instances of the same STT plugin serving concurrent requests
+
+    requests go to the first free worker, in threads or in separate
+    processes, in the latter case audio is handed over in shared memory
+    """
+
+    def __init__(self, config: dict, workers: int = 2, use_processes: bool = False,
+                 clazz: Optional[type] = None):
+        """
+        Args:
+            config: STT plugin configuration
+            workers: number of plugin instances
+            use_processes: run each plugin instance in its own process
+            clazz: STT class to instantiate, by default loaded via OVOSSTTFactory
+        """
+        self.workers = workers
+        self.use_processes = use_processes
+        self._lock = Lock()
+        self._started = time.time()
+        self._requests = 0
+        self._busy_time = 0.0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        if use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                 initializer=_init_pool_process,
+                                                 initargs=(config, clazz))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers,
+                                                thread_name_prefix="STTWorker")
+            self._free = Queue()
+            for _ in range(workers):
+                self._free.put(clazz(config) if clazz else OVOSSTTFactory.create(config))
+
+    def _record(self, submitted: float, start: float, end: float):
+        with self._lock:
+            wait = max(start - submitted, 0.0)
+            self._requests += 1
+            self._wait_time += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._busy_time += end - start
+
+    def _thread_transcribe(self, audio: AudioData, lang: Optional[str],
+                           submitted: float) -> List[Tuple[str, float]]:
+        stt = self._free.get()
+        start = time.time()
+        try:
+            return stt.transcribe(audio, lang)
+        finally:
+            self._free.put(stt)
+            self._record(submitted, start, time.time())
+
+    def submit(self, audio: AudioData, lang: Optional[str] = None) -> Future:
+        """queue a transcription, the future resolves to a list of (transcription, confidence)"""
+        submitted = time.time()
+        if not self.use_processes:
+            return self._executor.submit(self._thread_transcribe, audio, lang, submitted)
+
+        data = audio.frame_data
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        future = self._executor.submit(_pool_process_transcribe, shm.name, len(data),
+                                       audio.sample_rate, audio.sample_width, lang)
+        result = Future()
+
+        def _done(f):
+            shm.close()
+            shm.unlink()
+            try:
+                transcriptions, start, end = f.result()
+            except Exception as e:
+                result.set_exception(e)
+                return
+            self._record(submitted, start, end)
+            result.set_result(transcriptions)
+
+        future.add_done_callback(_done)
+        return result
+
+    def transcribe(self, audio: AudioData, lang: Optional[str] = None) -> List[Tuple[str, float]]:
+        """transcribe audio with the first free worker, blocking"""
+        return self.submit(audio, lang).result()
+
+    def get_stats(self) -> dict:
+        """queue wait time and utilization of the workers since the pool was created"""
+        with self._lock:
+            elapsed = max(time.time() - self._started, 1e-9)
+            return {"workers": self.workers,
+                    "requests": self._requests,
+                    "avg_wait": self._wait_time / self._requests if self._requests else 0.0,
+                    "max_wait": self._max_wait,
+                    "utilization": min(self._busy_time / (elapsed * self.workers), 1.0)}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+class HedgedSTT(STT):
+    """STT wrapper that hedges slow requests of a primary plugin with a fallback plugin"""
+
+    def __init__(self, primary: STT, fallback: STT, config: Optional[dict] = None):
+        """
+        Args:
+            primary: preferred STT plugin
+            fallback: STT plugin used when the primary is slow or failing
+            config: hedging options, see HedgedRequest.from_config
+        """
+        super().__init__(primary.config)
+        self.primary = primary
+        self.fallback = fallback
+        self.hedge = HedgedRequest.from_config(config or {})
+
+    @property
+    def available_languages(self):
+        return self.primary.available_languages
+
+    def execute(self, audio: AudioData, language: Optional[str] = None) -> str:
+        return self.hedge(lambda: self.primary.execute(audio, language),
+                          lambda: self.fallback.execute(audio, language))
+
+    def transcribe(self, audio: AudioData, lang: Optional[str] = None) -> List[Tuple[str, float]]:
+        return self.hedge(lambda: self.primary.transcribe(audio, lang),
+                          lambda: self.fallback.transcribe(audio, lang))
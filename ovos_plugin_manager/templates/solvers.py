@@ -1,5 +1,4 @@
 import abc
-import inspect
 from functools import wraps
 from typing import Optional, List, Iterable, Tuple, Dict, Union, Any
 
@@ -8,6 +7,7 @@ from ovos_utils.lang import standardize_lang_tag
 from ovos_utils.log import LOG, log_deprecation
 from ovos_utils.xdg_utils import xdg_cache_home
 
+from ovos_plugin_manager.utils import get_accepted_kwargs
 from ovos_plugin_manager.templates.language import LanguageTranslator, LanguageDetector
 from ovos_plugin_manager.thirdparty.solvers import AbstractSolver
 
@@ -718,7 +718,7 @@ def _call_with_sanitized_kwargs(func, *args: Any,
     Returns:
         Any: The result of the function call.
     """
-    params = inspect.signature(func).parameters
+    params = get_accepted_kwargs(func)
     kwargs = {}
 
     # ensure context is passed, it didn't used to be optional
@@ -1,7 +1,13 @@
+import asyncio
+import os
+import time
+import weakref
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from queue import Queue
-from threading import Thread, Event
-from typing import List, Tuple, Optional, Set, Union
+from threading import Thread, Event, Lock
+from typing import Callable, Iterator, List, Tuple, Optional, Set, Union
 
 from ovos_bus_client.session import SessionManager
 from ovos_plugin_manager.templates.transformers import AudioLanguageDetector
@@ -11,11 +17,67 @@ from ovos_utils.lang import standardize_lang_tag
 from ovos_utils.log import LOG
 from ovos_utils.process_utils import RuntimeRequirements
 from ovos_plugin_manager.utils.audio import AudioData
+from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
 from ovos_config import Configuration
 
 
+@dataclass
+class STTBatchResult:
+    """
+    Transcription of a single audio in a batch.
+
+    Attributes:
+        transcriptions (List[Tuple[str, float]]): (transcription, confidence) pairs, best first.
+        elapsed (float): Seconds spent transcribing this audio.
+    """
+    transcriptions: List[Tuple[str, float]]
+    elapsed: float = 0.0
+
+    @property
+    def text(self) -> str:
+        """best transcription"""
+        return self.transcriptions[0][0] if self.transcriptions else ""
+
+    @property
+    def confidence(self) -> float:
+        """confidence of the best transcription"""
+        return self.transcriptions[0][1] if self.transcriptions else 0.0
+
+
+@dataclass
+class STTPartialResult:
+    """
+    Interim or final hypothesis emitted by a StreamThread while audio is still streaming.
+
+    Attributes:
+        text (str): The transcription so far.
+        confidence (float): Confidence of the hypothesis, in [0.0, 1.0].
+        is_final (bool): True if the hypothesis will not change anymore.
+        timestamp (float): time.time() when the hypothesis was emitted.
+    """
+    text: str
+    confidence: float = 1.0
+    is_final: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+
+def _timed_transcribe(stt: "STT", audio: AudioData, lang: Optional[str]) -> STTBatchResult:
+    """transcribe a single audio, module level so it can be sent to a process pool"""
+    start = time.monotonic()
+    transcriptions = stt.transcribe(audio, lang)
+    return STTBatchResult(transcriptions, time.monotonic() - start)
+
+
 class STT(metaclass=ABCMeta):
     """ STT Base class, all  STT backends derives from this one. """
+    # shared by all STT instances, see transcribe_async
+    _async_executor: Optional[ThreadPoolExecutor] = None
+    _async_max_pending: int = 8
+    _async_lock = Lock()
+    _async_limits = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+    # default of the "batch_workers" config, plugins that are safe to call
+    # concurrently can opt in to parallel transcribe_batch by raising it
+    batch_workers: int = 1
 
     def __init__(self, config=None):
         self.config_core = Configuration()
@@ -29,6 +91,17 @@ class STT(metaclass=ABCMeta):
         self._recognizer = None
         self._detector = None
 
+    def handle_metric(self, metadata=None):
+        """ receive timing metrics for diagnostics
+        does nothing by default but plugins might use it"""
+
+    def add_metric(self, metadata=None):
+        """wraps handle_metric to catch exceptions"""
+        try:
+            self.handle_metric(metadata)
+        except Exception as e:
+            LOG.exception(e)
+
     def bind(self, detector: AudioLanguageDetector):
         self._detector = detector
         LOG.debug(f"{self.__class__.__name__} - Assigned lang detector: {detector}")
@@ -105,6 +178,7 @@ class STT(metaclass=ABCMeta):
         Transcribe audio into one or more text hypotheses with associated confidence scores.
         
         If `lang` is "auto", attempts language detection against supported languages and falls back to the instance's configured language on detection failure.
+        With "speculative_langs" set in config, detection runs concurrently with transcription in that many candidate languages, see _transcribe_speculative.
         
         Parameters:
             audio (AudioData): Audio to transcribe.
@@ -114,6 +188,8 @@ class STT(metaclass=ABCMeta):
             List[Tuple[str, float]]: A list of (transcription, confidence) pairs; confidence is a float in [0.0, 1.0].
         """
         if lang is not None and lang == "auto":
+            if self.config.get("speculative_langs", 0) > 1 and self._detector is not None:
+                return self._transcribe_speculative(audio)
             try:
                 lang, prob = self.detect_language(audio, self.available_languages)
             except Exception as e:
@@ -121,6 +197,134 @@ class STT(metaclass=ABCMeta):
                 lang = self.lang  # Fall back to default language
         return [(self.execute(audio, lang), 1.0)]
 
+    def _speculative_candidates(self, n: int) -> List[str]:
+        """the n most likely languages: the default language followed by the secondary languages"""
+        langs = [self.lang] + [standardize_lang_tag(l)
+                               for l in self.config_core.get("secondary_langs", [])]
+        available = {standardize_lang_tag(l) for l in self.available_languages or []}
+        candidates = []
+        for l in langs:
+            if l not in candidates and (not available or l in available):
+                candidates.append(l)
+        return candidates[:n]
+
+    def _transcribe_speculative(self, audio: AudioData) -> List[Tuple[str, float]]:
+        """
+        Detect the language while transcribing in the "speculative_langs" most likely languages.
+
+        If the detector is confident ("speculative_threshold", default 0.5) about one of the
+        candidates its transcription is used and the others are cancelled, otherwise the
+        candidate with the best detector probability * STT confidence wins.
+        Requires a plugin that can transcribe from several threads at once.
+        """
+        candidates = self._speculative_candidates(self.config["speculative_langs"])
+        pool = ThreadPoolExecutor(max_workers=len(candidates) + 1)
+        try:
+            detection = pool.submit(self.detect_language, audio, self.available_languages)
+            futures = {l: pool.submit(self.transcribe, audio, l) for l in candidates}
+            try:
+                detected, prob = detection.result()
+                detected = standardize_lang_tag(detected)
+            except Exception as e:
+                LOG.error(f"Language detection failed: {e}. Scoring transcriptions only.")
+                detected, prob = None, 0.0
+
+            if detected is not None and detected not in futures:
+                LOG.debug(f"detected language {detected} was not transcribed speculatively")
+                return self.transcribe(audio, detected)
+            if detected is not None and prob >= self.config.get("speculative_threshold", 0.5):
+                return futures[detected].result()
+
+            # unsure about the language, pick the most plausible transcription
+            best, best_score = None, -1.0
+            for l, future in futures.items():
+                try:
+                    transcriptions = future.result()
+                except Exception as e:
+                    LOG.error(f"speculative transcription in {l} failed: {e}")
+                    continue
+                if detected is None:
+                    lang_prob = 1.0 / len(futures)
+                elif l == detected:
+                    lang_prob = prob
+                else:
+                    lang_prob = (1.0 - prob) / max(len(futures) - 1, 1)
+                conf = transcriptions[0][1] if transcriptions and transcriptions[0][0] else 0.0
+                if lang_prob * conf > best_score:
+                    best, best_score = transcriptions, lang_prob * conf
+            return best if best is not None else [(self.execute(audio, self.lang), 1.0)]
+        finally:
+            # do not wait for the losers, cancel them if they did not start yet
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def transcribe_async(self, audio: AudioData,
+                               lang: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Transcribe audio without blocking the event loop.
+
+        Natively async engines (eg. websocket or HTTP APIs) should override this,
+        by default transcribe runs in an executor shared by all STT plugins.
+
+        The executor has "async_workers" threads and at most "async_max_pending"
+        requests per event loop are submitted to it, extra callers wait for a free slot,
+        both values are read from the "stt" section of mycroft.conf
+
+        Parameters:
+            audio (AudioData): Audio to transcribe.
+            lang (Optional[str]): Language code to use for transcription or "auto" to detect language.
+
+        Returns:
+            List[Tuple[str, float]]: A list of (transcription, confidence) pairs.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_async_executor()
+        limit = STT._async_limits.get(loop)
+        if limit is None:
+            limit = STT._async_limits[loop] = asyncio.Semaphore(STT._async_max_pending)
+        async with limit:
+            return await loop.run_in_executor(executor, self.transcribe, audio, lang)
+
+    def _get_async_executor(self) -> ThreadPoolExecutor:
+        """create the executor shared by all STT plugins on first use"""
+        with STT._async_lock:
+            if STT._async_executor is None:
+                cfg = self.config_core.get("stt", {})
+                workers = cfg.get("async_workers", min(4, os.cpu_count() or 1))
+                STT._async_max_pending = cfg.get("async_max_pending", 2 * workers)
+                STT._async_executor = ThreadPoolExecutor(max_workers=workers,
+                                                         thread_name_prefix="STTAsync")
+            return STT._async_executor
+
+    def transcribe_batch(self, audios: List[AudioData],
+                         lang: Optional[str] = None) -> List[STTBatchResult]:
+        """
+        Transcribe several audios at once.
+
+        Engines that can transcribe multiple audios in a single inference pass
+        should override this, by default transcribe is called for each audio
+        in turn. With "batch_workers" > 1 (config or class attribute) the audios
+        are transcribed in a pool, "batch_executor" selects a "thread" (default)
+        or "process" pool, the latter requires a picklable plugin.
+
+        Parameters:
+            audios (List[AudioData]): Audios to transcribe.
+            lang (Optional[str]): Language code used for all audios, or "auto" to detect language.
+
+        Returns:
+            List[STTBatchResult]: transcriptions and timing for each audio, in input order.
+        """
+        workers = min(self.config.get("batch_workers", self.batch_workers), len(audios))
+        if workers <= 1:
+            return [_timed_transcribe(self, audio, lang) for audio in audios]
+        if self.config.get("batch_executor", "thread") == "process":
+            executor = ProcessPoolExecutor
+        else:
+            executor = ThreadPoolExecutor
+        with executor(max_workers=workers) as pool:
+            futures = [pool.submit(_timed_transcribe, self, audio, lang)
+                       for audio in audios]
+            return [f.result() for f in futures]
+
     @classproperty
     @abstractmethod
     def available_languages(cls) -> Set[str]:
@@ -142,8 +346,54 @@ class StreamThread(Thread, metaclass=ABCMeta):
         self.language = standardize_lang_tag(language)
         self.queue = queue
         self.text = None
+        # max bytes per chunk given to handle_audio_stream, None for all pending audio
+        self.read_size = None
+        self.partial_callbacks: List[Callable[[STTPartialResult], None]] = []
+        self._partials = Queue()
+        self._final_emitted = False
+
+    def add_partial_callback(self, callback: Callable[[STTPartialResult], None]):
+        """call callback(STTPartialResult) for every hypothesis, from the stream thread"""
+        self.partial_callbacks.append(callback)
+
+    def emit_partial(self, text: str, confidence: float = 1.0, is_final: bool = False):
+        """
+        Publish a hypothesis, to be called by handle_audio_stream implementations
+        whenever the engine returns an interim or final result.
+        """
+        result = STTPartialResult(text, confidence, is_final)
+        if is_final:
+            self._final_emitted = True
+        self._partials.put(result)
+        for callback in self.partial_callbacks:
+            try:
+                callback(result)
+            except Exception as e:
+                LOG.exception(f"partial transcript callback failed: {e}")
+
+    def partial_results(self) -> Iterator[STTPartialResult]:
+        """iterate over the hypotheses as they are emitted, ends with the stream"""
+        while True:
+            result = self._partials.get()
+            if result is None:
+                self._partials.put(None)  # let other iterators finish too
+                break
+            yield result
+
+    def _get_views(self):
+        """yield zero copy views of the incoming audio, valid until the next one is requested"""
+        while True:
+            view = self.queue.read(self.read_size)
+            if view is None:
+                break
+            if view:
+                yield view
 
     def _get_data(self):
+        if isinstance(self.queue, AudioRingBuffer):
+            for view in self._get_views():
+                yield bytes(view)
+            return
         while True:
             d = self.queue.get()
             if d is None:
@@ -152,7 +402,16 @@ class StreamThread(Thread, metaclass=ABCMeta):
             self.queue.task_done()
 
     def run(self):
-        return self.handle_audio_stream(self._get_data(), self.language)
+        try:
+            return self.handle_audio_stream(self._get_data(), self.language)
+        finally:
+            # the recognizer is gone, stop writers waiting for it to make room
+            if isinstance(self.queue, AudioRingBuffer):
+                self.queue.close()
+            # engines that only set self.text still produce a final result
+            if not self._final_emitted and self.text:
+                self.emit_partial(self.text, is_final=True)
+            self._partials.put(None)
 
     def finalize(self):
         """ return final transcription """
@@ -173,29 +432,59 @@ class StreamingSTT(STT, metaclass=ABCMeta):
         self.stream = None
         self.can_stream = True
         self.transcript_ready = Event()
+        self._partial_callbacks = []
+
+    def on_partial(self, callback: Callable[[STTPartialResult], None]):
+        """
+        Register a callback for interim transcripts of every future stream.
+
+        Callbacks receive a STTPartialResult and run in the stream thread, they
+        should return quickly, eg. to start early intent matching or update captions.
+        """
+        self._partial_callbacks.append(callback)
+
+    def partial_results(self) -> Iterator[STTPartialResult]:
+        """iterate over the hypotheses of the active stream until it ends"""
+        if self.stream is None:
+            return iter(())
+        return self.stream.partial_results()
 
     def stream_start(self, language=None):
         """
         Start a new streaming recognition session and launch its worker thread.
         
-        Stops any existing stream, creates a new input queue and streaming thread, assigns a normalized language tag (defaults to the current STT language), clears the transcript-ready event, and starts the thread.
+        Stops any existing stream, creates a new input buffer and streaming thread, assigns a normalized language tag (defaults to the current STT language), clears the transcript-ready event, and starts the thread.
+        
+        The input buffer holds "stream_buffer_seconds" of audio, "stream_overflow" selects what happens when the recognizer falls behind, see AudioRingBuffer. The default "block" policy waits for the recognizer instead of dropping audio, for at most "stream_max_wait" seconds (default 2) per chunk, after which the chunk is dropped so a stalled recognizer can not hang the listener; "drop_oldest" and "coalesce" never wait but may drop audio.
         
         Parameters:
             language (str | None): Optional language tag to use for the stream; it will be normalized. If omitted, the instance's current language is used.
         """
         self.stream_stop()
-        self.queue = Queue()
+        self.queue = self._create_buffer()
         self.stream = self.create_streaming_thread()
         self.stream.language = standardize_lang_tag(language or self.lang)
+        for callback in self._partial_callbacks:
+            self.stream.add_partial_callback(callback)
         self.transcript_ready.clear()
         self.stream.start()
 
+    def _create_buffer(self) -> AudioRingBuffer:
+        bytes_per_second = self.config.get("sample_rate", 16000) * \
+                           self.config.get("sample_width", 2) * \
+                           self.config.get("channels", 1)
+        capacity = int(self.config.get("stream_buffer_seconds", 30) * bytes_per_second)
+        return AudioRingBuffer(capacity,
+                               overflow=self.config.get("stream_overflow", "block"),
+                               bytes_per_second=bytes_per_second,
+                               max_wait=self.config.get("stream_max_wait", 2.0))
+
     def stream_data(self, data: bytes):
         """
         Enqueue a chunk of raw audio for processing by the active streaming thread.
         
         Parameters:
-            data (bytes): Raw audio bytes to append to the stream queue in FIFO order.
+            data (bytes): Raw audio bytes to append to the stream buffer in FIFO order.
         """
         self.queue.put(data)
 
@@ -212,6 +501,10 @@ class StreamingSTT(STT, metaclass=ABCMeta):
             self.queue.put(None)
             text = self.stream.finalize()
             self.stream.join()
+            if isinstance(self.queue, AudioRingBuffer):
+                self.add_metric({"metric_type": "stt.stream.lag",
+                                 "max_lag": self.queue.max_lag,
+                                 "dropped_bytes": self.queue.dropped})
             self.stream = None
             self.queue = None
             self.transcript_ready.set()
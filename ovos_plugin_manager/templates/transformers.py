@@ -1,4 +1,5 @@
 import abc
+import json
 from typing import List, Tuple, Optional
 
 from ovos_bus_client.util import get_mycroft_bus
@@ -272,6 +273,11 @@ class DialogTransformer:
 
 class TTSTransformer:
     """ runs after TTS stage but before playback"""
+    # transformed audio can be stored in the TTS cache, keyed by the chain of
+    # transformers (name + version + config). Opt-in, only set to True if the
+    # output depends on nothing else, eg. message context or randomness
+    cacheable = False
+    version = "0"
 
     def __init__(self, name, priority=50, config=None):
         self.name = name
@@ -298,6 +304,12 @@ class TTSTransformer:
         """
         return wav_file, context
 
+    @property
+    def cache_key(self) -> str:
+        """ identifies this transformer output for caching purposes """
+        return json.dumps([self.name, str(self.version), self.config],
+                          sort_keys=True, default=str)
+
     def default_shutdown(self):
         """ perform any shutdown actions """
         pass
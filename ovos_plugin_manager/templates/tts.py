@@ -1,21 +1,27 @@
 import abc
 import asyncio
-import inspect
+import mmap
 import os.path
 import re
 import shutil
 import subprocess
 import sys
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from os.path import isfile, join
 from pathlib import Path
 from queue import Queue
-from typing import AsyncIterable, List, Dict, Set
+from typing import AsyncIterable, List, Dict, Set, Tuple, Pattern, Optional
 
 import quebra_frases
 from ovos_bus_client.apis.enclosure import EnclosureAPI
 from ovos_bus_client.message import Message, dig_for_message
 from ovos_bus_client.session import SessionManager
-from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache, hash_sentence
+from ovos_plugin_manager.utils import filter_kwargs
+from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache, TTSCacheManager, hash_sentence, \
+    normalize_sentence
 from ovos_utils import classproperty
 from ovos_utils.fakebus import FakeBus
 from ovos_utils.lang import standardize_lang_tag
@@ -27,8 +33,24 @@ from ovos_utils.process_utils import RuntimeRequirements
 from ovos_config import Configuration
 from ovos_config.locations import get_xdg_cache_save_path
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 EMPTY_PLAYBACK_QUEUE_TUPLE = (None, None, None, None, None)
 SSML_TAGS = re.compile(r'<[^>]*>')
+SSML_TAG_NAME = re.compile(r'<\s*[/\\]?\s*([^\s/>]+)')
+
+
+def _get_sentence_hash(sentence: str, config: dict) -> str:
+    """cache key of a sentence, normalized and hashed according to a TTS plugin config"""
+    opts = config.get("cache_normalize", {})
+    if opts is False:
+        normalized = sentence
+    else:
+        normalized = normalize_sentence(sentence, **opts)
+    return hash_sentence(normalized, config.get("cache_hash", "md5"))
 
 
 class TTSContext:
@@ -42,10 +64,12 @@ class TTSContext:
         synth_kwargs (dict): Optional dictionary containing additional keyword arguments for the TTS synthesizer.
 
     Class Attributes:
+        cache_manager (TTSCacheManager): owns the caches of all TTS contexts and enforces a global budget
         _caches (dict): A class-level dictionary acting as a cache store for different TTS contexts.
     """
 
-    _caches: Dict[str, TextToSpeechCache] = {}
+    cache_manager = TTSCacheManager()
+    _caches: Dict[str, TextToSpeechCache] = cache_manager.caches
 
     def __init__(self, plugin_id: str, lang: str, voice: str, synth_kwargs: dict = None):
         """
@@ -91,12 +115,12 @@ class TTSContext:
             "preloaded_cache": f"{get_xdg_cache_save_path()}/{self.tts_id}"
         }
         if self.tts_id not in TTSContext._caches:
-            TTSContext._caches[self.tts_id] = TextToSpeechCache(
+            TTSContext.cache_manager.register(self.tts_id, TextToSpeechCache(
                 cache_config, self.tts_id, audio_ext
-            )
+            ))
         return self._caches[self.tts_id]
 
-    def get_from_cache(self, sentence, audio_ext="wav", cache_config=None):
+    def get_from_cache(self, sentence, audio_ext="wav", cache_config=None, sentence_hash=None):
         """
         Retrieves an audio file and phoneme data from the cache, based on the input sentence.
 
@@ -104,6 +128,7 @@ class TTSContext:
             sentence (str): The sentence for which to retrieve audio data.
             audio_ext (str, optional): The file extension of the audio file (default is 'wav').
             cache_config (dict, optional): Configuration settings for the cache.
+            sentence_hash (str, optional): The cache key of the sentence, if already computed.
 
         Returns:
             tuple: A tuple containing the path to the cached audio file and optionally the phoneme data.
@@ -111,21 +136,30 @@ class TTSContext:
         Raises:
             FileNotFoundError: If the sentence is not found in the cache.
         """
-        sentence_hash = hash_sentence(sentence)
+        sentence_hash = sentence_hash or _get_sentence_hash(sentence, cache_config or {})
         phonemes = None
         cache = self.get_cache(audio_ext, cache_config)
-        if sentence_hash not in cache:
+        # single lookup, entries may be evicted in the background
+        cached = cache.lookup(sentence_hash)
+        if cached is None:
             raise FileNotFoundError(f"sentence is not cached, {sentence_hash}.{audio_ext}")
-        audio_file, pho_file = cache.cached_sentences[sentence_hash]
+        audio_file, pho_file = cached
         LOG.info(f"Found {audio_file.name} in TTS cache")
         if pho_file:
             phonemes = pho_file.load()
         return audio_file, phonemes
 
     @classmethod
-    def curate_caches(cls):
-        for cache in TTSContext._caches.values():
-            cache.curate()
+    def curate_caches(cls, wait=False):
+        """curate all TTS caches, by default in a background thread
+
+        Parameters:
+            wait (bool): block until curation is done
+        """
+        if wait:
+            TTSContext.cache_manager.curate()
+        else:
+            TTSContext.cache_manager.curate_async()
 
 
 class TTS:
@@ -148,6 +182,8 @@ class TTS:
     """
     queue = None
     playback = None
+    # phonetic spellings are shared by all instances of the same plugin
+    _loaded_spellings: Dict[str, Dict[str, dict]] = {}  # root_dir -> lang -> spellings
 
     def __init__(self, config=None, validator=None,
                  audio_ext='wav', phonetic_spelling=True, ssml_tags=None):
@@ -175,11 +211,14 @@ class TTS:
         self.log_timestamps = self.config.get("log_timestamps", False)
 
         self.enable_cache = self.config.get("enable_cache", True)
+        # TTSTransformers applied to the audio before playback, assigned by ovos-audio
+        # the output of cacheable chains is stored in the TTS cache
+        self.tts_transformers = []
 
         if TTS.queue is None:
             TTS.queue = Queue()
 
-        self.spellings: Dict[str, dict] = self.load_spellings()
+        self.spellings = self.load_spellings()
         self.add_metric({"metric_type": "tts.init"})
 
         # unused by plugins, assigned in init method by ovos-audio,
@@ -199,6 +238,17 @@ class TTS:
         # backwards compat
         self._lang = standardize_lang_tag(val)
 
+    @property
+    def spellings(self) -> Dict[str, dict]:
+        """phonetic spellings, lang -> word -> spelling"""
+        return self._spellings
+
+    @spellings.setter
+    def spellings(self, val: Dict[str, dict]):
+        # assign a new dict to change spellings, the regexes compiled from the old ones are dropped
+        self._spellings = val
+        self._spellings_regex: Dict[str, Optional[Tuple[Pattern, dict]]] = {}
+
     @property
     def plugin_id(self) -> str:
         """
@@ -248,6 +298,37 @@ class TTS:
         """
         return "", None
 
+    def get_tts_batch(self, sentences: List[str], wav_files: List[str],
+                      **kwargs) -> List[Tuple[str, Optional[str]]]:
+        """Synthesize several sentences at once.
+
+        Engines that can synthesize multiple sentences in a single inference
+        pass should override this, by default get_tts is called for each
+        sentence in a thread pool of "batch_workers" threads
+
+        Args:
+            sentences (list): The input sentences to synthesize.
+            wav_files (list): The output file path for each sentence.
+            **kwargs: synth params passed to get_tts (eg. lang, voice)
+
+        Returns:
+            list: (wav_file, phoneme) tuple for each sentence, in input order
+        """
+        workers = min(self.config.get("batch_workers", 4), len(sentences))
+        if workers <= 1:
+            return [self.get_tts(sentence, wav_file, **kwargs)
+                    for sentence, wav_file in zip(sentences, wav_files)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.get_tts, sentence, wav_file, **kwargs)
+                       for sentence, wav_file in zip(sentences, wav_files)]
+            return [f.result() for f in futures]
+
+    @property
+    def supports_batch_synth(self) -> bool:
+        """True if the plugin implements get_tts_batch or batching is enabled in config"""
+        return type(self).get_tts_batch is not TTS.get_tts_batch or \
+            self.config.get("batch_synth", False)
+
     def preprocess_sentence(self, sentence: str) -> List[str]:
         """Default preprocessing is a sentence_tokenizer,
         ie. splits the utterance into sub-sentences using quebra_frases
@@ -296,7 +377,7 @@ class TTS:
         Returns:
             str: input string stripped from tags.
         """
-        return re.sub('<[^>]*>', '', text).replace('  ', ' ')
+        return SSML_TAGS.sub('', text).replace('  ', ' ')
 
     @staticmethod
     def format_speak_tags(sentence: str, include_tags: bool = True) -> str:
@@ -349,28 +430,31 @@ class TTS:
             str: validated_sentence
         """
 
-        # Validate speak tags
-        if not self.ssml_tags or "speak" not in self.ssml_tags:
-            self.format_speak_tags(utterance, False)
-        elif self.ssml_tags and "speak" in self.ssml_tags:
-            self.format_speak_tags(utterance)
-
         # if ssml is not supported by TTS engine remove all tags
         if not self.ssml_tags:
             return self.remove_ssml(utterance)
 
-        # find ssml tags in string
-        tags = SSML_TAGS.findall(utterance)
+        supported = self._get_supported_ssml_tags()
 
-        for tag in tags:
-            if any(supported in tag for supported in self.ssml_tags):
-                utterance = utterance.replace(tag, self.modify_tag(tag))
-            else:
-                # remove unsupported tag
-                utterance = utterance.replace(tag, "")
+        def _rewrite(match):
+            tag = match.group(0)
+            name = SSML_TAG_NAME.match(tag)
+            if name and name.group(1) in supported:
+                return self.modify_tag(tag)
+            # remove unsupported tag
+            return ""
+
+        # single pass over the utterance, keeping only supported ssml tags
+        return SSML_TAGS.sub(_rewrite, utterance).replace("  ", " ")
 
-        # return text with supported ssml tags only
-        return utterance.replace("  ", " ")
+    def _get_supported_ssml_tags(self) -> Set[str]:
+        """lookup set of self.ssml_tags, rebuilt only when the tags change
+
+        keyed on a copy of the tags, so in-place edits of the list are seen too"""
+        cached = getattr(self, "_ssml_lookup", None)
+        if cached is None or cached[0] != self.ssml_tags:
+            cached = self._ssml_lookup = (self.ssml_tags[:], frozenset(self.ssml_tags))
+        return cached[1]
 
     # init helpers
     def init(self, bus, playback):
@@ -418,6 +502,13 @@ class TTS:
         """
         if config:
             LOG.warning("config argument is deprecated and unused!")
+        if self.root_dir not in TTS._loaded_spellings:
+            TTS._loaded_spellings[self.root_dir] = self._read_spellings()
+        # a copy per instance, so changes made by one plugin do not leak into others
+        return {lang: dict(spellings)
+                for lang, spellings in TTS._loaded_spellings[self.root_dir].items()}
+
+    def _read_spellings(self) -> Dict[str, dict]:
         spellings_data = {}
         locale = f"{self.root_dir}/locale"
         if os.path.isdir(locale):
@@ -429,7 +520,8 @@ class TTS:
                     with open(spellings_file) as f:
                         lines = filter(bool, f.read().split('\n'))
                     lines = [i.split(':') for i in lines]
-                    spellings_data[lang] = {key.strip(): value.strip() for key, value in lines}
+                    spellings_data[lang] = {key.strip(): value.strip()
+                                            for key, value in lines if key.strip()}
                 except ValueError:
                     LOG.exception(f'Failed to load {lang} phonetic spellings.')
         return spellings_data
@@ -482,20 +574,43 @@ class TTS:
         self.end_audio()
 
     ## synth
+    def _get_spellings_regex(self, lang: str) -> Optional[Tuple[Pattern, dict]]:
+        """compile the phonetic spellings of a language into a single
+        case-insensitive alternation, matching whole words only
+
+        compiled once per language, until spellings is assigned again
+
+        Returns:
+            tuple: (regex, lowercase word -> phonetic spelling), None if there are no spellings
+        """
+        if lang not in self._spellings_regex:
+            spellings = {k.lower(): v for k, v in self.spellings.get(lang, {}).items() if k}
+            compiled = None
+            if spellings:
+                # longest first, so multi word entries win over their prefixes
+                words = sorted(spellings, key=len, reverse=True)
+                regex = re.compile(r"(?<![\w'])(?:" + "|".join(map(re.escape, words)) + r")(?![\w'])",
+                                   re.IGNORECASE)
+                compiled = (regex, spellings)
+            self._spellings_regex[lang] = compiled
+        return self._spellings_regex[lang]
+
     def _replace_phonetic_spellings(self, sentence: str, lang: str) -> str:
         # TODO match lang code
-        if self.phonetic_spelling and lang in self.spellings:
-            for word in re.findall(r"[\w']+", sentence):
-                if word.lower() in self.spellings[lang]:
-                    spelled = self.spellings[lang][word.lower()]
-                    sentence = sentence.replace(word, spelled)
+        if self.phonetic_spelling:
+            compiled = self._get_spellings_regex(lang)
+            if compiled:
+                regex, spellings = compiled
+                sentence = regex.sub(lambda m: spellings.get(m.group(0).lower(), m.group(0)),
+                                     sentence)
         return sentence
 
-    def _get_visemes(self, phonemes, sentence, ctxt):
-        # get visemes/mouth movements
+    def _get_visemes(self, phonemes, sentence, ctxt, sentence_hash=None):
+        # get visemes/mouth movements, precomputed at synthesis time if cached
         viseme = []
         if phonemes:
-            viseme = self.viseme(phonemes)
+            viseme = self._get_cached_visemes(sentence, ctxt, sentence_hash) or \
+                     self.viseme(phonemes)
         if not viseme:
             # Debug level because this is expected in default installs
             LOG.debug(f"no mouth movements available! unknown visemes for {sentence}")
@@ -519,9 +634,7 @@ class TTS:
             kwargs["voice"] = self.voice
 
         # filter kwargs accepted by this specific plugin
-        kwargs = {k: v for k, v in kwargs.items()
-                  if k in inspect.signature(self.get_tts).parameters
-                  and k not in ["sentence", "wav_file"]}
+        kwargs = filter_kwargs(self.get_tts, kwargs, exclude=("sentence", "wav_file"))
 
         LOG.debug(f"TTS kwargs: {kwargs}")
         return TTSContext(plugin_id=self.plugin_id,
@@ -551,26 +664,51 @@ class TTS:
                   dig_for_message() or \
                   Message("speak", context={"session": {"session_id": ident}})
 
+        # synth all chunks in one go if the plugin supports it
+        results = None
+        if len(chunks) > 1 and self.supports_batch_synth:
+            results = self.synth_batch([c for c, _ in chunks], ctxt)
+
         # synth -> queue for playback
-        for sentence, l in chunks:
+        for idx, (sentence, l) in enumerate(chunks):
             # load from cache or synth + cache
-            audio_file, phonemes = self.synth(sentence, ctxt)
+            audio_file, phonemes = results[idx] if results else self.synth(sentence, ctxt)
 
             # get visemes/mouth movements
-            viseme = self._get_visemes(phonemes, sentence, ctxt)
+            viseme = self._get_visemes(phonemes, sentence, ctxt,
+                                       getattr(audio_file, "sentence_hash", None))
 
             # update message info with the utterance chunk
             # this allows ovos-audio to know which text segment is currently playing
             message.data["utterance"] = sentence
 
+            wav_file = str(audio_file)
+            if self.tts_transformers:
+                wav_file = self._transform_audio(wav_file, ctxt, message,
+                                                 getattr(audio_file, "sentence_hash", None))
+
             # queue audio for playback
             TTS.queue.put(
-                (str(audio_file), viseme, l, ctxt.tts_id, message)
+                (wav_file, viseme, l, ctxt.tts_id, message)
             )
 
             # metrics timing callback
             self.add_metric({"metric_type": "tts.queued"})
 
+    def _transform_audio(self, wav_file: str, ctxt: TTSContext, message: Message,
+                         sentence_hash: Optional[str] = None) -> str:
+        """Apply self.tts_transformers to synthesized audio, reusing cached output
+
+        Returns:
+            str: path to the audio to be played
+        """
+        from ovos_plugin_manager.dialog_transformers import transform_tts_audio
+        cache = ctxt.get_cache(self.audio_ext, self.config) if self.enable_cache else None
+        wav_file, message.context = transform_tts_audio(self.tts_transformers, wav_file,
+                                                        message.context, cache, sentence_hash)
+        self.add_metric({"metric_type": "tts.transformed"})
+        return wav_file
+
     def synth(self, sentence, ctxt: TTSContext = None, **kwargs):
         """
         Synthesizes speech for the given sentence. wraps get_tts
@@ -586,17 +724,21 @@ class TTS:
             tuple: A tuple containing the path to the synthesized audio file and phoneme data.
         """
         self.add_metric({"metric_type": "tts.synth.start"})
-        sentence_hash = hash_sentence(sentence)
+        sentence_hash = self.get_sentence_hash(sentence)
 
         # parse kwargs for this TTS request
         ctxt = ctxt or self._get_ctxt(kwargs)
         cache = ctxt.get_cache(self.audio_ext, self.config)
 
         # load from cache
-        if self.enable_cache and sentence_hash in cache:
-            audio, phonemes = ctxt.get_from_cache(sentence, cache)
-            self.add_metric({"metric_type": "tts.synth.finished", "cache": True})
-            return audio, phonemes
+        if self.enable_cache and self._in_cache(sentence, sentence_hash, cache):
+            try:
+                audio, phonemes = ctxt.get_from_cache(sentence, self.audio_ext, self.config,
+                                                      sentence_hash=sentence_hash)
+                self.add_metric({"metric_type": "tts.synth.finished", "cache": True})
+                return audio, phonemes
+            except FileNotFoundError:
+                LOG.debug(f"{sentence_hash} was evicted from cache, synthesizing it again")
 
         # synth + cache
         audio = cache.define_audio_file(sentence_hash)
@@ -614,6 +756,68 @@ class TTS:
                                  phonemes, sentence_hash)
         return audio, phonemes
 
+    def synth_batch(self, sentences: List[str], ctxt: TTSContext = None, **kwargs) -> list:
+        """
+        Synthesizes speech for several sentences. wraps get_tts_batch
+
+        cached sentences are read from cache, the remaining ones are
+        synthesized in a single get_tts_batch call and saved to cache
+
+        can be used to pre-warm the cache with a list of sentences
+
+        Args:
+            sentences (list): The sentences to synthesize.
+            ctxt (TTSContext): The TTS context.
+            **kwargs: Additional synth arguments for get_tts_batch.
+
+        Returns:
+            list: (audio file, phoneme data) tuple for each sentence, in input order
+        """
+        self.add_metric({"metric_type": "tts.synth_batch.start", "n_sentences": len(sentences)})
+        ctxt = ctxt or self._get_ctxt(kwargs)
+        cache = ctxt.get_cache(self.audio_ext, self.config)
+
+        results = [None] * len(sentences)
+        missing = []  # (idx, sentence, sentence_hash, audio)
+        occurrences = {}  # sentence_hash -> indexes of the sentences sharing it
+        for idx, sentence in enumerate(sentences):
+            sentence_hash = self.get_sentence_hash(sentence)
+            if sentence_hash in occurrences:  # repeated sentence, synthesized once
+                occurrences[sentence_hash].append(idx)
+                continue
+            occurrences[sentence_hash] = [idx]
+            if self.enable_cache and self._in_cache(sentence, sentence_hash, cache):
+                try:
+                    results[idx] = ctxt.get_from_cache(sentence, self.audio_ext, self.config,
+                                                       sentence_hash=sentence_hash)
+                    continue
+                except FileNotFoundError:
+                    LOG.debug(f"{sentence_hash} was evicted from cache, synthesizing it again")
+            audio = cache.define_audio_file(sentence_hash)
+            base_dir = os.path.dirname(str(audio))
+            if base_dir:  # handle empty string
+                os.makedirs(base_dir, exist_ok=True)
+            missing.append((idx, sentence, sentence_hash, audio))
+
+        if missing:
+            synths = self.get_tts_batch([m[1] for m in missing],
+                                        [str(m[3]) for m in missing],
+                                        **ctxt.synth_kwargs)
+            for (idx, sentence, sentence_hash, audio), (path, phonemes) in zip(missing, synths):
+                audio.path = path
+                if self.enable_cache:
+                    self._cache_sentence(sentence, ctxt.lang, audio, cache,
+                                         phonemes, sentence_hash)
+                results[idx] = (audio, phonemes)
+
+        for first, *repeated in occurrences.values():
+            for idx in repeated:
+                results[idx] = results[first]
+
+        self.add_metric({"metric_type": "tts.synth_batch.finished",
+                         "n_synth": len(missing)})
+        return results
+
     def viseme(self, phonemes):
         """Create visemes from phonemes.
 
@@ -641,6 +845,37 @@ class TTS:
         return visimes or None
 
     ## cache
+    def get_sentence_hash(self, sentence: str) -> str:
+        """cache key of a sentence
+
+        the sentence is normalized first according to "cache_normalize" in config,
+        so trivial variants share a cache entry, "cache_hash" selects the hash function
+        """
+        return _get_sentence_hash(sentence, self.config)
+
+    def _in_cache(self, sentence: str, sentence_hash: str, cache: TextToSpeechCache) -> bool:
+        """check if a sentence is cached
+
+        entries cached under the legacy key (md5 of the raw sentence) are migrated to sentence_hash,
+        the legacy key is only computed while files from a previous run are left to migrate
+        """
+        if sentence_hash in cache:
+            cache.legacy_entries.discard(sentence_hash)
+            return True
+        if not cache.legacy_entries:
+            return False
+        if self.config.get("cache_hash", "md5") == "md5":
+            opts = self.config.get("cache_normalize", {})
+            if opts is False or normalize_sentence(sentence, **opts) == sentence:
+                return False  # the legacy key is sentence_hash
+        legacy_hash = hash_sentence(sentence)
+        if legacy_hash in cache.legacy_entries and legacy_hash in cache:
+            LOG.debug(f"migrating TTS cache entry {legacy_hash} -> {sentence_hash}")
+            cache.rename(legacy_hash, sentence_hash)
+            cache.legacy_entries.discard(legacy_hash)
+            return True
+        return False
+
     def _cache_phonemes(self, sentence, lang: str, cache: TextToSpeechCache = None, phonemes=None, sentence_hash=None):
         """
         Caches phonemes for the given sentence.
@@ -651,13 +886,37 @@ class TTS:
             phonemes (str, optional): The phonemes for the sentence.
             sentence_hash (str, optional): The hash of the sentence.
         """
-        sentence_hash = sentence_hash or hash_sentence(sentence)
+        sentence_hash = sentence_hash or self.get_sentence_hash(sentence)
         if phonemes:
             phoneme_file = cache.define_phoneme_file(sentence_hash)
             phoneme_file.save(phonemes)
+            # precompute mouth movements so cache hits don't need to parse phonemes
+            visemes = self.viseme(phonemes)
+            if visemes:
+                phoneme_file.visemes.save(visemes)
             return phoneme_file
         return None
 
+    def _get_cached_visemes(self, sentence, ctxt: TTSContext, sentence_hash=None):
+        """
+        Looks up the visemes stored in cache for the given sentence.
+
+        Args:
+            sentence (str): The sentence to get visemes for.
+            ctxt (TTSContext): The TTS context.
+            sentence_hash (str, optional): The cache key of the sentence, if already computed.
+
+        Returns:
+            list: visemes, or None if not cached
+        """
+        if not self.enable_cache:
+            return None
+        cache = ctxt.get_cache(self.audio_ext, self.config)
+        cached = cache.cached_sentences.get(sentence_hash or self.get_sentence_hash(sentence))
+        if cached and cached[1] is not None:
+            return cached[1].visemes.load()
+        return None
+
     def _cache_sentence(self, sentence, lang: str, audio_file, cache, phonemes=None, sentence_hash=None):
         """
         Caches the sentence along with associated audio and phonemes.
@@ -669,12 +928,13 @@ class TTS:
             phonemes (str, optional): The phonemes for the sentence.
             sentence_hash (str, optional): The hash of the sentence.
         """
-        sentence_hash = sentence_hash or hash_sentence(sentence)
+        sentence_hash = sentence_hash or self.get_sentence_hash(sentence)
         # RANT: why do you hate strings ChrisV?
         if isinstance(audio_file.path, str):
             audio_file.path = Path(audio_file.path)
         pho_file = self._cache_phonemes(sentence, lang, cache, phonemes, sentence_hash)
         cache.cached_sentences[sentence_hash] = (audio_file, pho_file)
+        cache.track(sentence_hash)
         self.add_metric({"metric_type": "tts.synth.cached"})
 
     ## shutdown
@@ -738,6 +998,12 @@ class TTSValidator:
 
 
 class ConcatTTS(TTS):
+    """TTS engine that synthesizes speech by concatenating pre-recorded audio units
+
+    if numpy is available 16bit PCM wav units are memory mapped once, kept in a
+    LRU unit cache and concatenated in-process, other formats fall back to sox
+    """
+
     def __init__(self, *args, **kwargs):
         super(ConcatTTS, self).__init__(*args, **kwargs)
         self.time_step = float(self.config.get("time_step", 0.1))
@@ -746,6 +1012,8 @@ class ConcatTTS(TTS):
         self.sound_files_path = self.config.get("sounds")
         self.channels = self.config.get("channels", "1")
         self.rate = self.config.get("rate", "16000")
+        self.unit_cache_size = self.config.get("unit_cache_size", 256)
+        self._units = OrderedDict()  # (path, rate, channels) -> int16 array (frames, channels)
 
     @abc.abstractmethod
     def sentence_to_files(self, sentence):
@@ -754,8 +1022,92 @@ class ConcatTTS(TTS):
         """
         raise NotImplementedError
 
-    def concat(self, files, wav_file):
-        """ generate output wav file from input files """
+    @staticmethod
+    def _mmap_wav(path):
+        """memory map a 16bit PCM wav file
+
+        Returns:
+            tuple: (samples array of shape (frames, channels), sample_rate)
+
+        Raises:
+            ValueError: if the file is not a 16bit PCM wav file
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError(f"not a wav file: {path}")
+        channels = rate = None
+        pos = 12
+        while pos + 8 <= len(mm):
+            chunk_id = mm[pos:pos + 4]
+            size = int.from_bytes(mm[pos + 4:pos + 8], "little")
+            if chunk_id == b"fmt ":
+                audio_format = int.from_bytes(mm[pos + 8:pos + 10], "little")
+                channels = int.from_bytes(mm[pos + 10:pos + 12], "little")
+                rate = int.from_bytes(mm[pos + 12:pos + 16], "little")
+                bits = int.from_bytes(mm[pos + 22:pos + 24], "little")
+                if audio_format != 1 or bits != 16:
+                    raise ValueError(f"unsupported wav encoding: {path}")
+            elif chunk_id == b"data":
+                if channels is None:
+                    break
+                size = min(size, len(mm) - pos - 8)
+                samples = np.frombuffer(mm, dtype="<i2",
+                                        count=size // (2 * channels) * channels,
+                                        offset=pos + 8)
+                return samples.reshape(-1, channels), rate
+            pos += 8 + size + (size & 1)
+        raise ValueError(f"malformed wav file: {path}")
+
+    def _load_unit(self, path):
+        """return the samples of a unit file in the output format, converting only if needed
+
+        Raises:
+            ValueError: if the unit needs a conversion that is left to sox
+        """
+        channels, out_rate = int(self.channels), int(self.rate)
+        key = (path, out_rate, channels)
+        if key in self._units:
+            self._units.move_to_end(key)
+            return self._units[key]
+        samples, rate = self._mmap_wav(path)
+        if rate > out_rate:
+            # linear interpolation aliases without a low-pass filter, let sox resample
+            raise ValueError(f"can not downsample {rate}Hz to {out_rate}Hz: {path}")
+        if samples.shape[1] != channels:
+            if channels == 1:
+                samples = samples.mean(axis=1, keepdims=True)
+            elif samples.shape[1] == 1:
+                samples = np.repeat(samples, channels, axis=1)
+            else:
+                # no unambiguous channel mapping, let sox remix
+                raise ValueError(f"can not convert {samples.shape[1]} channels to {channels}: {path}")
+        if rate != out_rate and len(samples):
+            n_out = int(round(len(samples) * out_rate / rate))
+            src_t = np.arange(len(samples)) / rate
+            out_t = np.arange(n_out) / out_rate
+            samples = np.stack([np.interp(out_t, src_t, samples[:, c])
+                                for c in range(samples.shape[1])], axis=1)
+        if samples.dtype != np.int16:
+            samples = np.clip(np.round(samples), -32768, 32767).astype(np.int16)
+        self._units[key] = samples
+        if len(self._units) > self.unit_cache_size:
+            self._units.popitem(last=False)
+        return samples
+
+    def _concat_pcm(self, files, wav_file):
+        """concatenate wav units in-process, written to wav_file in a single pass"""
+        units = [self._load_unit(file) for file in files if isfile(file)]
+        with wave.open(wav_file, "wb") as f:
+            f.setnchannels(int(self.channels))
+            f.setsampwidth(2)
+            f.setframerate(int(self.rate))
+            f.setnframes(sum(len(u) for u in units))
+            for unit in units:
+                f.writeframesraw(unit.astype("<i2", copy=False).tobytes())
+        return wav_file
+
+    def _concat_sox(self, files, wav_file):
         cmd = ["sox"]
         for file in files:
             if not isfile(file):
@@ -774,6 +1126,15 @@ class ConcatTTS(TTS):
         LOG.info(subprocess.check_output(cmd))
         return wav_file
 
+    def concat(self, files, wav_file):
+        """ generate output wav file from input files """
+        if np is not None and wav_file.endswith(".wav"):
+            try:
+                return self._concat_pcm(files, wav_file)
+            except ValueError as e:
+                LOG.debug(f"in-process concatenation not possible, falling back to sox: {e}")
+        return self._concat_sox(files, wav_file)
+
     def get_tts(self, sentence, wav_file, lang=None):
         """
             get data from tts.
@@ -799,26 +1160,87 @@ class RemoteTTSTimeoutException(RemoteTTSException):
 
 
 class StreamingTTSCallbacks:
-    """handle the playback of streaming TTS, can be overrided in StreamingTTS"""
+    """handle the playback of streaming TTS, can be overrided in StreamingTTS
+
+    by default a new player process is spawned for every utterance
+
+    if "persistent_playback" is enabled in the TTS config a single raw PCM player
+    is kept alive and reused across utterances, saving the process start-up time.
+    In this mode the plugin must stream 16bit PCM audio, optionally with a WAV header
+    that is stripped before playback, "stream_sample_rate" and "stream_channels"
+    describe the audio format
+    """
 
     def __init__(self, bus, play_args=None, tts_config=None):
         self.bus = bus
         self.config = tts_config or {}
+        self.persistent = self.config.get("persistent_playback", False)
+        self.sample_rate = int(self.config.get("stream_sample_rate", 22050))
+        self.channels = int(self.config.get("stream_channels", 1))
         if not play_args:
             # Check for the best available player depending on the system's audio server.
             # anything that accepts audio via stdin should work
             # TODO - pw-play only outputs high pitched noise, investigate and add it here for pipewire systems
-            player = shutil.which("ffplay") or shutil.which("paplay") or shutil.which("aplay")
+            if self.persistent:
+                player = shutil.which("paplay") or shutil.which("aplay") or shutil.which("ffplay")
+            else:
+                player = shutil.which("ffplay") or shutil.which("paplay") or shutil.which("aplay")
             if not player:
                 raise RuntimeError(
                     "No audio player found (please install 'ffmpeg', 'pulseaudio-utils' or 'alsa-utils').")
-            self.play_args = [player]
-            if player.endswith("ffplay"):
-                self.play_args += ["-autoexit", "-nodisp"]
-            self.play_args += ["-"]
+            if self.persistent:
+                self.play_args = self._raw_play_args(player)
+            else:
+                self.play_args = [player]
+                if player.endswith("ffplay"):
+                    self.play_args += ["-autoexit", "-nodisp"]
+                self.play_args += ["-"]
         else:
             self.play_args = play_args
         self._process = None
+        self._header = None  # buffered start of the stream while looking for a WAV header
+        self._play_start = 0.0
+        self._bytes_played = 0
+
+    def _raw_play_args(self, player):
+        """command line for a player reading raw 16bit PCM from stdin"""
+        rate, channels = str(self.sample_rate), str(self.channels)
+        if player.endswith("paplay"):
+            return [player, "--raw", "--format=s16le",
+                    f"--rate={rate}", f"--channels={channels}"]
+        if player.endswith("aplay"):
+            return [player, "-q", "-t", "raw", "-f", "S16_LE",
+                    "-r", rate, "-c", channels, "-"]
+        # -ac instead of -ch_layout, which needs ffmpeg >= 5.1
+        return [player, "-nodisp", "-loglevel", "quiet", "-f", "s16le",
+                "-ar", rate, "-ac", channels, "-"]
+
+    def _spawn_player(self):
+        LOG.debug(f"stream playback command: {self.play_args}")
+        # unbuffered pipe, every chunk is handed to the player as soon as it is written
+        self._process = subprocess.Popen(self.play_args, stdin=subprocess.PIPE, bufsize=0)
+
+    def _strip_wav_header(self, chunk):
+        """buffer the start of an utterance until the WAV header (if any) can be dropped
+
+        Returns:
+            bytes: PCM data ready for playback, empty while the header is incomplete
+        """
+        buf = self._header + chunk
+        if not b"RIFF".startswith(buf[:4]):
+            self._header = None  # not a WAV stream, play as is
+            return buf
+        # walk the RIFF sub-chunks until "data"
+        pos = 12
+        while pos + 8 <= len(buf):
+            chunk_id = buf[pos:pos + 4]
+            size = int.from_bytes(buf[pos + 4:pos + 8], "little")
+            if chunk_id == b"data":
+                self._header = None
+                return buf[pos + 8:]
+            pos += 8 + size + (size & 1)
+        self._header = buf
+        return b""
 
     def stream_start(self, message=None):
         """prepare anything needed to playback streamed audio
@@ -834,17 +1256,35 @@ class StreamingTTSCallbacks:
             self.bus.emit(message.forward("ovos.common_play.duck"))
         self.bus.emit(message.forward("recognizer_loop:audio_output_start"))
 
+        if self.persistent:
+            self._header = b""
+            self._bytes_played = 0
+            if self._process is None or self._process.poll() is not None:
+                self._spawn_player()
+            return
+
         if self._process:
             self.stream_stop()
-        LOG.debug(f"stream playback command: {self.play_args}")
-        self._process = subprocess.Popen(self.play_args, stdin=subprocess.PIPE)
+        self._spawn_player()
 
     def stream_chunk(self, chunk):
         """Play streamed chunk of audio"""
         LOG.debug(f"TTS stream chunk: {self.__class__.__name__} - {len(chunk)} bytes")
-        if self._process:
+        if not self._process:
+            return
+        if self.persistent:
+            if self._header is not None:
+                chunk = self._strip_wav_header(chunk)
+                if not chunk:
+                    return
+            if not self._bytes_played:
+                self._play_start = time.monotonic()
+            self._bytes_played += len(chunk)
+        try:
             self._process.stdin.write(chunk)
-            self._process.stdin.flush()
+        except BrokenPipeError:
+            LOG.error("TTS stream player exited unexpectedly")
+            self._process = None
 
     def stream_stop(self, listen=False, message=None):
         """got all streamed audio, cleanup state
@@ -856,10 +1296,17 @@ class StreamingTTSCallbacks:
         LOG.info(f"TTS stream stop: {self.__class__.__name__}")
         message = message or dig_for_message() or Message("speak")
 
-        if self._process:
-            self._process.stdin.close()
-            self._process.wait()
-        self._process = None
+        if self.persistent:
+            # the player stays alive, wait for the buffered audio to be played out
+            self._header = None
+            if self._bytes_played:
+                duration = self._bytes_played / (self.sample_rate * self.channels * 2)
+                remaining = self._play_start + duration - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+            self._bytes_played = 0
+        else:
+            self._close_player()
 
         # we don't use the regular PlaybackThread here, we need to handle recognizer_loop:audio_output_end and listen flag
         if not self.config.get("pulse_duck", False):
@@ -868,6 +1315,19 @@ class StreamingTTSCallbacks:
         if listen:
             self.bus.emit(message.forward('mycroft.mic.listen'))
 
+    def _close_player(self):
+        if self._process:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._process.wait()
+        self._process = None
+
+    def shutdown(self):
+        """terminate the player process, if any"""
+        self._close_player()
+
 
 class StreamingTTS(TTS):
     """
@@ -900,19 +1360,33 @@ class StreamingTTS(TTS):
 
     async def generate_audio(self, sentence, wav_file, play_streaming=True,
                              listen=False, message=None, plugin_kwargs=None):
-        """save streamed TTS to wav file, if configured also play TTS as it becomes available"""
+        """save streamed TTS to wav file, if configured also play TTS as it becomes available
+
+        audio is streamed into a temporary ".part" file that is only moved to
+        wav_file once the stream completes, a partial stream never ends up in the cache
+        """
         plugin_kwargs = plugin_kwargs or {}
+        part_file = f"{wav_file}.part"
         if play_streaming:
             self.callbacks.stream_start(message)
-        with open(wav_file, "wb") as f:
-            try:
+        start = time.monotonic()
+        first_chunk = True
+        try:
+            with open(part_file, "wb") as f:
                 async for chunk in self.stream_tts(sentence, **plugin_kwargs):
+                    if first_chunk:
+                        first_chunk = False
+                        self.add_metric({"metric_type": "tts.stream.first_chunk",
+                                         "time_to_first_chunk": time.monotonic() - start})
                     f.write(chunk)
                     if play_streaming:
                         self.callbacks.stream_chunk(chunk)
-            finally:
-                if play_streaming:
-                    self.callbacks.stream_stop(listen, message)
+            os.replace(part_file, wav_file)
+        finally:
+            if os.path.isfile(part_file):
+                os.remove(part_file)
+            if play_streaming:
+                self.callbacks.stream_stop(listen, message)
         return wav_file
 
     def _execute(self, sentence, ident, listen, **kwargs):
@@ -930,24 +1404,26 @@ class StreamingTTS(TTS):
         sentence = self._replace_phonetic_spellings(sentence, ctxt.lang)
         self.add_metric({"metric_type": "tts.preprocessed"})
 
-        sentence_hash = hash_sentence(sentence)
+        sentence_hash = self.get_sentence_hash(sentence)
 
         # if cached, play existing file instead
-        if self.enable_cache and sentence_hash in cache:
+        if self.enable_cache and self._in_cache(sentence, sentence_hash, cache):
             super()._execute(sentence, ident, listen,
                              preprocess=False, **ctxt.synth_kwargs)
             return
 
-        wav_file = str(cache.define_audio_file(sentence_hash))
+        audio_file = cache.define_audio_file(sentence_hash)
+        # ensure cache dir exists
+        base_dir = os.path.dirname(str(audio_file))
+        if base_dir:  # handle empty string
+            os.makedirs(base_dir, exist_ok=True)
 
         message = kwargs.get("message") or \
                   dig_for_message() or \
                   Message("speak")
 
         # filter kwargs accepted by this specific plugin
-        ctxt.synth_kwargs = {k: v for k, v in kwargs.items()
-                             if k in inspect.signature(self.stream_tts).parameters
-                             and k not in ["sentence"]}
+        ctxt.synth_kwargs = filter_kwargs(self.stream_tts, kwargs, exclude=("sentence",))
 
         # handle streaming TTS
         loop = asyncio.new_event_loop()
@@ -955,7 +1431,7 @@ class StreamingTTS(TTS):
         try:
             self.add_metric({"metric_type": "tts.stream.start"})
             loop.run_until_complete(
-                self.generate_audio(sentence, wav_file,
+                self.generate_audio(sentence, str(audio_file),
                                     play_streaming=True,
                                     listen=listen,
                                     message=message,
@@ -965,6 +1441,18 @@ class StreamingTTS(TTS):
             loop.close()
             self.add_metric({"metric_type": "tts.stream.end"})
 
+        # stream completed, next time this sentence is played from cache
+        if self.enable_cache:
+            self._cache_sentence(sentence, ctxt.lang, audio_file, cache,
+                                 sentence_hash=sentence_hash)
+
+    def shutdown(self):
+        """Shuts down the TTS engine and the streaming audio player."""
+        callbacks = getattr(self, "callbacks", None)
+        if hasattr(callbacks, "shutdown"):
+            callbacks.shutdown()
+        super().shutdown()
+
     def get_tts(self, sentence, wav_file, **kwargs):
         """wrap streaming TTS into sync usage"""
         loop = asyncio.new_event_loop()
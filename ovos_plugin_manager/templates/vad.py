@@ -1,12 +1,19 @@
 import abc
-import collections
-from typing import Iterable
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence
 
 from ovos_utils import classproperty
+from ovos_utils.log import LOG
 from ovos_utils.process_utils import RuntimeRequirements
 
 from ovos_config import Configuration
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class AudioFrame:
     """Represents a "frame" of audio data."""
@@ -17,6 +24,173 @@ class AudioFrame:
         self.duration = duration
 
 
+class EnergyGate:
+    """Cheap RMS / zero crossing pre-filter in front of a plugin VAD
+
+    frames clearly quieter than the noise floor plus margin_db never reach the
+    plugin, frames near that threshold always do. Voiced frames (few zero
+    crossings) get headroom_db more slack than noisy ones (many zero crossings).
+
+    The noise floor starts at min_rms and only adapts to frames below the
+    threshold that end up classified as silence, so audio starting with
+    speech can not push it to speech level.
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        """
+        Args:
+            config: margin_db (default 6), min_rms (default 50, int16 scale),
+                    headroom_db (default 3, how far below the threshold frames
+                    still reach the plugin), zcr_noise (default 0.35, fraction
+                    of samples changing sign above which a frame is noise like)
+                    and adaptation (default 0.05, noise floor update rate)
+        """
+        config = config or {}
+        self.margin = 10 ** (config.get("margin_db", 6) / 20)
+        self.headroom = 10 ** (-config.get("headroom_db", 3) / 20)
+        self.min_rms = config.get("min_rms", 50)
+        self.zcr_noise = config.get("zcr_noise", 0.35)
+        self.adaptation = config.get("adaptation", 0.05)
+        self.noise_floor: float = self.min_rms / self.margin
+        self._rms = None
+        self._threshold = None
+        self.frames = 0  # frames seen
+        self.passed = 0  # frames given to the plugin VAD
+        self.speech = 0  # frames the plugin VAD classified as speech
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_rms, self.noise_floor * self.margin)
+
+    def filter(self, block: bytes, num_frames: int) -> List[bool]:
+        """True for the frames of a block of 16 bit audio that may contain speech"""
+        samples = np.frombuffer(block, dtype="<i2").reshape(num_frames, -1).astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        zcr = np.mean(np.signbit(samples[:, 1:]) != np.signbit(samples[:, :-1]), axis=1)
+        threshold = self.threshold
+        level = np.where(zcr > self.zcr_noise, threshold * self.headroom,
+                         threshold * self.headroom * self.headroom)
+        candidates = rms >= level
+        self._rms = rms
+        self._threshold = threshold
+        self.frames += num_frames
+        self.passed += int(candidates.sum())
+        return candidates.tolist()
+
+    def update(self, is_speech: Sequence[bool]):
+        """adapt the noise floor to the frames of the last block below the threshold classified as silence"""
+        self.speech += sum(is_speech)
+        quiet = self._rms[~np.asarray(is_speech, dtype=bool) & (self._rms < self._threshold)]
+        if len(quiet):
+            self.noise_floor += self.adaptation * (float(quiet.mean()) - self.noise_floor)
+
+    def get_stats(self) -> dict:
+        """per stage pass rates"""
+        return {"frames": self.frames,
+                "noise_floor": self.noise_floor,
+                "energy_gate_pass_rate": self.passed / self.frames if self.frames else 0.0,
+                "vad_pass_rate": self.speech / self.passed if self.passed else 0.0}
+
+
+@dataclass
+class VADEvent:
+    """
+    Speech boundary detected by VADEngine.feed
+
+    Attributes:
+        event (str): VADEvent.SPEECH_START or VADEvent.SPEECH_END
+        timestamp (float): seconds since the start of the stream
+        audio (Optional[bytes]): the speech segment, for SPEECH_END events
+    """
+    SPEECH_START = "speech_start"
+    SPEECH_END = "speech_end"
+
+    event: str
+    timestamp: float
+    audio: Optional[bytes] = None
+
+
+class VADSegmenter:
+    """Incremental version of VADEngine.extract_speech for audio streams
+
+    applies the same trigger rules frame by frame as audio arrives, with O(1)
+    work per frame, and keeps going after a segment ends so a stream can
+    produce several segments. Memory is bounded by the padding window and
+    "max_segment_ms" (default 30 seconds), longer segments are cut.
+    """
+
+    def __init__(self, vad: "VADEngine"):
+        self.vad = vad
+        self.frame_size = vad.frame_size
+        self.frame_seconds = vad.frame_duration_ms / 1000.0
+        self.window = vad.num_padding_frames
+        self.limit = vad.thresh * self.window
+        self.max_segment_frames = int(vad.config.get("max_segment_ms", 30000) /
+                                      vad.frame_duration_ms)
+        self.reset()
+
+    def reset(self):
+        """forget the stream, eg. when the microphone restarts"""
+        self._pending = bytearray()  # incomplete frame
+        self._frames = 0  # frames processed so far
+        self._flags = bytearray(max(self.window, 1))  # is_speech of the last frames
+        self._window_start = 0  # first frame of the sliding window
+        self._count = 0  # voiced (or unvoiced while in speech) frames in the window
+        self._padding = deque(maxlen=max(self.window, 1))  # audio of the window before speech
+        self._segment: Optional[bytearray] = None
+        self._segment_frames = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._segment is not None
+
+    def feed(self, chunk: bytes) -> List[VADEvent]:
+        """process a chunk of audio, returns the speech boundaries it contains"""
+        self._pending += chunk
+        n = self.frame_size
+        num_frames = len(self._pending) // n
+        if num_frames == 0 or self.window <= 0:
+            return []
+        data = bytes(self._pending[:num_frames * n])
+        del self._pending[:num_frames * n]
+        events = []
+        for i, is_speech in enumerate(self.vad._speech_flags(data)):
+            self._process(data[i * n:(i + 1) * n], is_speech, events)
+        return events
+
+    def _process(self, frame: bytes, is_speech: bool, events: List[VADEvent]):
+        idx = self._frames
+        self._frames += 1
+        counting = not self.in_speech  # count voiced frames before speech, unvoiced during
+        if idx - self._window_start >= self.window:
+            if bool(self._flags[idx % self.window]) == counting:
+                self._count -= 1
+        self._flags[idx % self.window] = is_speech
+        if is_speech == counting:
+            self._count += 1
+
+        if not self.in_speech:
+            self._padding.append(frame)
+            if self._count > self.limit:
+                start = idx - len(self._padding) + 1
+                self._segment = bytearray(b"".join(self._padding))
+                self._segment_frames = len(self._padding)
+                self._padding.clear()
+                self._window_start = idx + 1
+                self._count = 0
+                events.append(VADEvent(VADEvent.SPEECH_START, start * self.frame_seconds))
+            return
+
+        self._segment += frame
+        self._segment_frames += 1
+        if self._count > self.limit or self._segment_frames >= self.max_segment_frames:
+            events.append(VADEvent(VADEvent.SPEECH_END, (idx + 1) * self.frame_seconds,
+                                   bytes(self._segment)))
+            self._segment = None
+            self._window_start = idx + 1
+            self._count = 0
+
+
 class VADEngine:
     def __init__(self, config=None, sample_rate=None):
         self.config_core = Configuration()
@@ -28,6 +202,16 @@ class VADEngine:
         self.frame_duration_ms = self.config.get("frame_duration_ms", 30)
         self.thresh = self.config.get("thresh", 0.8)
         self.num_padding_frames = int(self.padding_duration_ms / self.frame_duration_ms)
+        # frames scored per is_silence_batch call
+        self.batch_size = self.config.get("batch_size", 64)
+        self._segmenter: Optional[VADSegmenter] = None
+        self.energy_gate: Optional[EnergyGate] = None
+        gate_config = self.config.get("energy_gate")
+        if gate_config:
+            if np is None:
+                LOG.warning("numpy is not installed, VAD energy gate disabled")
+            else:
+                self.energy_gate = EnergyGate(gate_config if isinstance(gate_config, dict) else {})
 
     @classproperty
     def runtime_requirements(cls):
@@ -70,7 +254,7 @@ class VADEngine:
         the sample rate.
         Yields Frames of the requested duration.
         """
-        n = int(self.sample_rate * (self.frame_duration_ms / 1000.0) * 2)
+        n = self.frame_size
         offset = 0
         timestamp = 0.0
         duration = (float(n) / self.sample_rate) / 2.0
@@ -80,49 +264,134 @@ class VADEngine:
             timestamp += duration
             offset += n
 
+    @property
+    def frame_size(self) -> int:
+        """bytes per frame of 16 bit mono audio"""
+        return int(self.sample_rate * (self.frame_duration_ms / 1000.0) * 2)
+
     def extract_speech(self, audio: bytes) -> bytes:
         """returns the audio data with speech only, removing all noise before and after speech"""
-        # We use a deque for our sliding window/ring buffer.
-        ring_buffer = collections.deque(maxlen=self.num_padding_frames)
-        triggered = False
-        is_speech = False
-        voiced_frames = []
-
-        for frame in self._frame_generator(audio):
-
-            is_speech = not self.is_silence(frame.bytes)
-
-            if not triggered:
-                ring_buffer.append((frame, is_speech))
-                num_voiced = len([f for f, speech in ring_buffer if speech])
-                # If we're NOTTRIGGERED and more than 90% of the frames in
-                # the ring buffer are voiced frames, then enter the
-                # TRIGGERED state.
-                if num_voiced > self.thresh * ring_buffer.maxlen:
-                    triggered = True
-                    # We want to yield all the audio we see from now until
-                    # we are NOTTRIGGERED, but we have to start with the
-                    # audio that's already in the ring buffer.
-                    for f, s in ring_buffer:
-                        voiced_frames.append(f)
-                    ring_buffer.clear()
-            else:
-                # We're in the TRIGGERED state, so collect the audio data
-                # and add it to the ring buffer.
-                voiced_frames.append(frame)
-                ring_buffer.append((frame, is_speech))
-                num_unvoiced = len([f for f, speech in ring_buffer if not speech])
-
-                # If more than 90% of the frames in the ring buffer are
-                # unvoiced, then enter NOTTRIGGERED and yield whatever
-                # audio we've collected.
-                if num_unvoiced > self.thresh * ring_buffer.maxlen:
-                    return b''.join([f.bytes for f in voiced_frames])
+        # speech is triggered when more than thresh of the last num_padding_frames
+        # frames are voiced, and ends when more than thresh of them are unvoiced.
+        # frames are never copied into python objects and the sliding window is
+        # tracked with running counters, O(1) per frame.
+        n = self.frame_size
+        window = self.num_padding_frames
+        limit = self.thresh * window
+        if window <= 0:
+            return None  # empty window, speech never triggers
+        flags = bytearray(window)  # is_speech of the last frames, indexed by frame % window
+        window_start = 0  # first frame of the sliding window
+        count = 0  # voiced (or unvoiced once triggered) frames in the window
+        speech_start = None  # first frame of the extracted speech
+
+        for idx, is_speech in enumerate(self._speech_flags(audio)):
+
+            # slide the window, dropping the oldest frame when full
+            if idx - window_start >= window:
+                if bool(flags[idx % window]) == (speech_start is None):
+                    count -= 1
+            flags[idx % window] = is_speech
+            if is_speech == (speech_start is None):
+                count += 1
+
+            if speech_start is None:
+                if count > limit:
+                    # speech starts with the audio already in the window
+                    speech_start = max(window_start, idx - window + 1)
+                    window_start = idx + 1
+                    count = 0
+            elif count > limit:
+                return audio[speech_start * n:(idx + 1) * n]
+
+    def feed(self, chunk: bytes) -> List[VADEvent]:
+        """
+        Stream audio through the VAD, chunks can be of any size.
+
+        Returns the speech start/end events found in this chunk, speech end
+        events carry the audio of the whole segment. Call reset_stream
+        before feeding an unrelated stream.
+        """
+        if self._segmenter is None:
+            self._segmenter = VADSegmenter(self)
+        return self._segmenter.feed(chunk)
+
+    def reset_stream(self):
+        """discard the state of the audio stream given to feed"""
+        if self._segmenter is not None:
+            self._segmenter.reset()
+
+    def _speech_flags(self, audio: bytes) -> Iterator[bool]:
+        """is_speech for every full frame of audio, scored in batches if the plugin supports it"""
+        n = self.frame_size
+        num_frames = len(audio) // n
+        if not self.supports_batch and self.energy_gate is None:
+            for idx in range(num_frames):
+                yield not self.is_silence(audio[idx * n:(idx + 1) * n])
+            return
+        for first in range(0, num_frames, self.batch_size):
+            last = min(first + self.batch_size, num_frames)
+            frames = [audio[idx * n:(idx + 1) * n] for idx in range(first, last)]
+            if self.energy_gate is None:
+                for silent in self.is_silence_batch(frames):
+                    yield not silent
+                continue
+            # only frames that pass the energy gate reach the plugin
+            candidates = self.energy_gate.filter(audio[first * n:last * n], last - first)
+            is_speech = [False] * len(frames)
+            idxs = [i for i, candidate in enumerate(candidates) if candidate]
+            if idxs:
+                if self.supports_batch:
+                    silences = self.is_silence_batch([frames[i] for i in idxs])
+                else:
+                    silences = [self.is_silence(frames[i]) for i in idxs]
+                for i, silent in zip(idxs, silences):
+                    is_speech[i] = not silent
+            self.energy_gate.update(is_speech)
+            yield from is_speech
+
+    def get_stats(self) -> dict:
+        """pass rates of the energy gate and the plugin VAD, empty if the gate is disabled"""
+        return self.energy_gate.get_stats() if self.energy_gate else {}
 
     @abc.abstractmethod
     def is_silence(self, chunk) -> bool:
         # return True or False
         return False
 
+    @property
+    def supports_batch(self) -> bool:
+        """True if the plugin scores several frames per call, see is_silence_batch"""
+        return type(self).is_silence_batch is not VADEngine.is_silence_batch
+
+    def is_silence_batch(self, frames: Sequence[bytes]) -> Sequence[bool]:
+        """is_silence for several frames at once
+
+        neural VADs should override this to score all frames in a single
+        inference, by default is_silence is called for each frame
+
+        Args:
+            frames: audio frames of frame_duration_ms each
+        Returns:
+            a bool per frame, a list or a numpy array
+        """
+        return [self.is_silence(frame) for frame in frames]
+
+    def speech_probability(self, chunk) -> float:
+        """probability of speech in a frame, plugins with a score should override this"""
+        return 0.0 if self.is_silence(chunk) else 1.0
+
+    def speech_probability_batch(self, frames: Sequence[bytes]) -> Sequence[float]:
+        """speech_probability for several frames at once
+
+        Args:
+            frames: audio frames of frame_duration_ms each
+        Returns:
+            a float per frame, a list or a numpy array
+        """
+        if type(self).speech_probability is VADEngine.speech_probability:
+            return [0.0 if silent else 1.0 for silent in self.is_silence_batch(frames)]
+        return [self.speech_probability(frame) for frame in frames]
+
     def reset(self):
         pass
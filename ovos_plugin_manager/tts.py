@@ -1,7 +1,11 @@
 import json
 import os
+from threading import Lock
+from typing import List
 from ovos_plugin_manager.templates.tts import TTS, TTSContext, TTSValidator, TextToSpeechCache, ConcatTTS
-from ovos_plugin_manager.utils import PluginTypes, PluginConfigTypes
+from ovos_plugin_manager.utils import PluginTypes, PluginConfigTypes, filter_kwargs
+from ovos_plugin_manager.utils.hedging import HedgedRequest
+from ovos_config import Configuration
 from ovos_utils.log import LOG
 from ovos_utils.xdg_utils import xdg_data_home
 from hashlib import md5
@@ -171,3 +175,137 @@ class OVOSTTSFactory:
                           f'\nAvailable modules: {modules}')
             raise
         return tts
+
+    @staticmethod
+    def create_hedged(config=None):
+        """Factory method to create a TTS engine with runtime failover.
+
+        If the configured module is slower than usual, the "fallback_module" is
+        queried too and the first answer is used, a circuit breaker sends requests
+        straight to the fallback while the main module is degraded.
+
+        "tts": {
+            "module": <engine_name>,
+            "fallback_module": <engine_name>,
+            "hedge": {"percentile": 95, "failure_threshold": 5, "reset_timeout": 30}
+        }
+        """
+        base = config or Configuration()
+        section = base.get("tts") or base
+        primary = OVOSTTSFactory.create(config)
+        fallback_module = section.get("fallback_module")
+        if not fallback_module or fallback_module == section.get("module"):
+            return primary
+        fallback = OVOSTTSFactory.create(get_tts_config(config, fallback_module))
+        return HedgedTTS(primary, fallback, section.get("hedge") or {})
+
+
+class HedgedTTS(TTS):
+    """TTS wrapper that hedges slow requests of a primary plugin with a fallback plugin
+
+    behaves like the primary plugin, everything but get_tts is delegated to it.
+    Both plugins synthesize to their own temporary file, the winner is moved to
+    the requested wav_file. Audio produced by the fallback is a different voice,
+    it is played but never cached under the primary voice.
+    """
+
+    def __init__(self, primary: TTS, fallback: TTS, config: dict = None):
+        """
+        Args:
+            primary: preferred TTS plugin
+            fallback: TTS plugin used when the primary is slow or failing
+            config: hedging options, see HedgedRequest.from_config
+        """
+        # TTS.__init__ is not called, state (config, spellings, root_dir...) is the primary's
+        self.primary = primary
+        self.fallback = fallback
+        self.hedge = HedgedRequest.from_config(config or {})
+        self._fallback_audio = set()  # paths synthesized by the fallback plugin
+        self._fallback_lock = Lock()
+
+    def __getattr__(self, item):
+        if item in ("primary", "fallback"):  # not initialized yet
+            raise AttributeError(item)
+        return getattr(self.primary, item)
+
+    @property
+    def lang(self):
+        return self.primary.lang
+
+    @lang.setter
+    def lang(self, val):
+        self.primary.lang = val
+
+    @property
+    def voice(self):
+        return self.primary.voice
+
+    @voice.setter
+    def voice(self, val):
+        self.primary.voice = val
+
+    @property
+    def plugin_id(self) -> str:
+        return self.primary.plugin_id
+
+    @property
+    def available_languages(self):
+        return self.primary.available_languages
+
+    @property
+    def supports_batch_synth(self) -> bool:
+        return False  # every sentence is hedged on its own
+
+    def preprocess_sentence(self, sentence: str) -> List[str]:
+        return self.primary.preprocess_sentence(sentence)
+
+    def modify_tag(self, tag):
+        return self.primary.modify_tag(tag)
+
+    def validate_ssml(self, utterance):
+        return self.primary.validate_ssml(utterance)
+
+    def viseme(self, phonemes):
+        return self.primary.viseme(phonemes)
+
+    def handle_metric(self, metadata=None):
+        return self.primary.handle_metric(metadata)
+
+    def init(self, bus, playback):
+        super().init(bus, playback)
+        self.primary.init(bus, playback)
+
+    def get_tts(self, sentence, wav_file, lang=None, voice=None):
+        base = os.path.splitext(wav_file)[0]
+
+        def _primary():
+            kwargs = filter_kwargs(self.primary.get_tts, {"lang": lang, "voice": voice})
+            path = f"{base}.primary.{self.primary.audio_ext}"
+            path, phonemes = self.primary.get_tts(sentence, path, **kwargs)
+            return path, phonemes, False
+
+        def _fallback():
+            # voices are plugin specific, the fallback uses its configured voice
+            kwargs = filter_kwargs(self.fallback.get_tts, {"lang": lang})
+            path = f"{base}.fallback.{self.fallback.audio_ext}"
+            path, phonemes = self.fallback.get_tts(sentence, path, **kwargs)
+            return path, phonemes, True
+
+        path, phonemes, from_fallback = self.hedge(_primary, _fallback)
+        path = str(path)
+        # the loser keeps its own file, it may still be writing to it
+        if os.path.splitext(path)[1] == os.path.splitext(wav_file)[1]:
+            os.replace(path, wav_file)
+            path = wav_file
+        if from_fallback:
+            with self._fallback_lock:
+                self._fallback_audio.add(path)
+        return path, phonemes
+
+    def _cache_sentence(self, sentence, lang: str, audio_file, cache, phonemes=None, sentence_hash=None):
+        with self._fallback_lock:
+            if str(audio_file.path) in self._fallback_audio:
+                self._fallback_audio.discard(str(audio_file.path))
+                LOG.debug(f"not caching fallback audio for: {sentence}")
+                return
+        super()._cache_sentence(sentence, lang, audio_file, cache, phonemes, sentence_hash)
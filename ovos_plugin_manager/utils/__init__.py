@@ -13,13 +13,15 @@
 """Common functions for loading plugins."""
 from collections import deque
 
+import inspect
 import pkg_resources
 import time
 import warnings
+import weakref
 from enum import Enum
 from ovos_utils.log import LOG, log_deprecation, deprecated
 from threading import Event, Lock
-from typing import Optional, Union
+from typing import Optional, Union, FrozenSet, Iterable, Tuple
 
 DEPRECATED_ENTRYPOINTS = {
     "ovos.plugin.gui": "opm.gui",
@@ -273,6 +275,56 @@ def normalize_lang(lang):
     return standardize_lang_tag(lang)
 
 
+# function -> (all parameter names, parameter names without the first one),
+# weak keys so functions of unloaded plugins are not kept alive
+_SIGNATURES = weakref.WeakKeyDictionary()
+
+
+def _signature_params(func) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    try:
+        return _SIGNATURES[func]
+    except KeyError:
+        pass
+    except TypeError:  # not weak referenceable, eg. builtins
+        return _introspect(func)
+    params = _SIGNATURES[func] = _introspect(func)
+    return params
+
+
+def _introspect(func) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    names = list(inspect.signature(func).parameters)
+    return frozenset(names), frozenset(names[1:])
+
+
+def get_accepted_kwargs(func) -> FrozenSet[str]:
+    """
+    Get the names of the parameters accepted by a callable
+
+    The signature is only introspected once per function, bound methods are
+    resolved to the underlying function so the result is shared by all
+    instances of a class, their first parameter (self/cls) is not included
+    @param func: callable to introspect
+    @return: frozenset of parameter names
+    """
+    bound = getattr(func, "__self__", None) is not None and hasattr(func, "__func__")
+    func = getattr(func, "__func__", func)
+    params, unbound_params = _signature_params(func)
+    return unbound_params if bound else params
+
+
+def filter_kwargs(func, kwargs: dict, exclude: Iterable[str] = ()) -> dict:
+    """
+    Keep only the kwargs accepted by a callable
+    @param func: callable the kwargs are meant for
+    @param kwargs: candidate keyword arguments
+    @param exclude: parameter names to drop even if accepted
+    @return: filtered kwargs
+    """
+    params = get_accepted_kwargs(func)
+    return {k: v for k, v in kwargs.items()
+            if k in params and k not in exclude}
+
+
 class ReadWriteStream:
     """
     Class used to support writing binary audio data at any pace,
@@ -0,0 +1,185 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Lock
+from typing import Callable, Optional
+
+from ovos_utils.log import LOG
+
+
+class CircuitBreaker:
+    """Route traffic away from a degraded backend
+
+    closed: requests go to the backend
+    open: after failure_threshold consecutive failures the backend is skipped
+    half_open: after reset_timeout seconds a single trial request is let through,
+        if it succeeds the circuit closes again, otherwise it re-opens
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and \
+                    time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """True if the backend should be tried, reserves the trial request when half open"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and \
+                    time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    LOG.warning("circuit breaker open, backend is degraded")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class HedgedRequest:
+    """Call a primary backend, and a fallback if the primary is slower than usual
+
+    The fallback is launched once the primary has been running for longer than
+    the given percentile of its recent latencies (or default_delay until enough
+    samples were collected), whichever answers first is used.
+    The loser keeps running in the background, it can not be interrupted,
+    its result is discarded (if it did not start yet it is cancelled).
+
+    Slow or failed primary requests count as failures of a CircuitBreaker,
+    while it is open requests go straight to the fallback.
+
+    Primary and fallback run in separate pools, so hung primaries can not
+    delay the fallback, and no request waits longer than timeout seconds.
+    """
+
+    def __init__(self, percentile: float = 95, default_delay: float = 2.0,
+                 min_samples: int = 10, window: int = 100,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 4,
+                 timeout: Optional[float] = 30.0):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="HedgedRequest")
+        self._fallback_executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                     thread_name_prefix="HedgedFallback")
+        self.stats = {"primary": 0, "fallback": 0, "hedged": 0}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HedgedRequest":
+        """
+        config keys: percentile, default_delay, min_samples, window, timeout,
+        failure_threshold and reset_timeout
+        """
+        breaker = CircuitBreaker(config.get("failure_threshold", 5),
+                                 config.get("reset_timeout", 30.0))
+        return cls(percentile=config.get("percentile", 95),
+                   default_delay=config.get("default_delay", 2.0),
+                   min_samples=config.get("min_samples", 10),
+                   window=config.get("window", 100),
+                   timeout=config.get("timeout", 30.0),
+                   breaker=breaker)
+
+    @property
+    def hedge_delay(self) -> float:
+        """seconds to wait for the primary before launching the fallback"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            latencies = sorted(self._latencies)
+        idx = min(int(len(latencies) * self.percentile / 100), len(latencies) - 1)
+        return latencies[idx]
+
+    def _record_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def __call__(self, primary: Callable, fallback: Callable):
+        """run primary() hedged by fallback(), returns the first successful result"""
+        if not self.breaker.allow_request():
+            self.stats["fallback"] += 1
+            return fallback()
+
+        start = time.monotonic()
+
+        def _timed():
+            try:
+                return primary()
+            finally:
+                # slow requests are recorded too, even if their result is discarded
+                self._record_latency(time.monotonic() - start)
+
+        primary_future = self._executor.submit(_timed)
+        delay = self.hedge_delay
+        done, _ = wait([primary_future], timeout=delay)
+        if done and primary_future.exception() is None:
+            self.breaker.record_success()
+            self.stats["primary"] += 1
+            return primary_future.result()
+        if done:
+            LOG.error(f"primary request failed: {primary_future.exception()}")
+            self.breaker.record_failure()
+            self.stats["fallback"] += 1
+            return fallback()
+
+        # primary is slow, race it against the fallback
+        self.stats["hedged"] += 1
+        fallback_future = self._fallback_executor.submit(fallback)
+        pending = {primary_future, fallback_future}
+        error = None
+        deadline = None if self.timeout is None else start + max(self.timeout, delay)
+        while pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                if primary_future in pending:  # hung primary
+                    self.breaker.record_failure()
+                for future in pending:
+                    future.cancel()
+                raise TimeoutError(f"no result after {self.timeout} seconds")
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    if future is primary_future:
+                        self.breaker.record_failure()
+                    continue
+                if future is primary_future:
+                    self.breaker.record_success()
+                    self.stats["primary"] += 1
+                else:
+                    # primary lost the race, it is degraded
+                    self.breaker.record_failure()
+                    self.stats["fallback"] += 1
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+        raise error
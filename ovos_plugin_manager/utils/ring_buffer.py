@@ -0,0 +1,226 @@
+import time
+from queue import Empty
+from threading import Condition
+from typing import Optional, Union
+
+
+class AudioRingBuffer:
+    """Bounded, preallocated byte ring buffer to stream audio from a single writer to a single reader
+
+    The reader gets memoryviews into the buffer instead of copies, a view stays
+    valid until the next read or release call. All data pending when the reader
+    asks for more is returned at once (up to the wrap around point), so a reader
+    that falls behind catches up in fewer, larger reads.
+
+    Overflow policies, applied when the writer gets ahead of the reader:
+        block: the writer waits for free space, for at most max_wait seconds,
+            audio that still does not fit is dropped so a stalled reader can
+            never hang the writer
+        drop_oldest: the oldest unread audio is discarded to make room
+        coalesce: the writer never waits, overflowing chunks are merged into a
+            single spill buffer (of at most capacity bytes) that is moved into
+            the ring as the reader frees space, when the spill is full its oldest
+            bytes are dropped, so the start of the stream is kept intact
+
+    Also implements put/get/task_done, so it can replace a queue.Queue of chunks
+    """
+    POLICIES = ("block", "drop_oldest", "coalesce")
+
+    def __init__(self, capacity: int, overflow: str = "block",
+                 bytes_per_second: int = 32000, max_wait: Optional[float] = 2.0):
+        """
+        Args:
+            capacity: buffer size in bytes
+            overflow: one of POLICIES
+            bytes_per_second: audio byte rate, used to report the lag in seconds
+            max_wait: default seconds a blocked write waits for free space, None waits forever
+        """
+        if overflow not in self.POLICIES:
+            raise ValueError(f"unknown overflow policy '{overflow}', "
+                             f"expected one of {self.POLICIES}")
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.overflow = overflow
+        self.bytes_per_second = bytes_per_second
+        self.max_wait = max_wait
+        self._buf = bytearray(self.capacity)
+        # absolute stream positions, the buffer index is pos % capacity
+        self._head = 0  # oldest byte still in use, start of the view held by the reader
+        self._read = 0  # next unread byte
+        self._tail = 0  # next byte to be written
+        self._spill = bytearray()
+        self._closed = False
+        self._cond = Condition()
+        self.dropped = 0  # bytes lost to overflow
+        self.max_lag = 0.0  # seconds
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def free(self) -> int:
+        """bytes that can be written without overflowing"""
+        return self.capacity - (self._tail - self._head)
+
+    @property
+    def pending(self) -> int:
+        """bytes written but not read yet"""
+        return self._tail - self._read + len(self._spill)
+
+    @property
+    def lag(self) -> float:
+        """seconds of audio waiting for the reader"""
+        return self.pending / self.bytes_per_second
+
+    def _copy_in(self, data: memoryview):
+        """copy data into the free space, must fit"""
+        n = len(data)
+        idx = self._tail % self.capacity
+        first = min(n, self.capacity - idx)
+        self._buf[idx:idx + first] = data[:first]
+        if first < n:
+            self._buf[:n - first] = data[first:]
+        self._tail += n
+
+    def _copy_out(self, pos: int, n: int) -> bytes:
+        idx = pos % self.capacity
+        first = min(n, self.capacity - idx)
+        return bytes(self._buf[idx:idx + first]) + bytes(self._buf[:n - first])
+
+    def _drop_unread(self, n: int):
+        """discard the n oldest unread bytes"""
+        if self._head == self._read:  # no view held, just skip
+            self._head = self._read = self._read + n
+            return
+        # keep the held view intact, move the remaining unread bytes next to it
+        rest = self._copy_out(self._read + n, self._tail - self._read - n)
+        self._tail = self._read
+        self._copy_in(memoryview(rest))
+
+    def _drain_spill(self):
+        if self._spill:
+            n = min(self.free, len(self._spill))
+            self._copy_in(memoryview(self._spill)[:n])
+            del self._spill[:n]
+
+    def write(self, data: Union[bytes, bytearray, memoryview],
+              timeout: Optional[float] = None) -> bool:
+        """Append audio to the buffer
+
+        Args:
+            data: raw audio
+            timeout: max seconds to wait for free space, block policy only,
+                defaults to max_wait
+        Returns:
+            False if the buffer is closed or the write timed out,
+            unwritten audio is counted as dropped
+        """
+        data = memoryview(data).cast("B")
+        with self._cond:
+            if self._closed:
+                return False
+            if self.overflow == "block":
+                timeout = self.max_wait if timeout is None else timeout
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while data:
+                    while self.free == 0 and not self._closed:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if self._closed or self.free == 0:
+                        self.dropped += len(data)
+                        return False
+                    n = min(self.free, len(data))
+                    self._copy_in(data[:n])
+                    data = data[n:]
+                    self._cond.notify_all()
+                return True
+
+            if self.overflow == "drop_oldest":
+                need = len(data) - self.free
+                if need > 0:
+                    drop = min(need, self._tail - self._read)
+                    self._drop_unread(drop)
+                    self.dropped += drop
+                if len(data) > self.free:  # held view + data do not fit, keep the newest audio
+                    self.dropped += len(data) - self.free
+                    data = data[len(data) - self.free:]
+                self._copy_in(data)
+            else:  # coalesce
+                self._drain_spill()
+                n = 0 if self._spill else min(self.free, len(data))
+                self._copy_in(data[:n])
+                if n < len(data):
+                    self._spill += data[n:]
+                    excess = len(self._spill) - self.capacity
+                    if excess > 0:
+                        del self._spill[:excess]
+                        self.dropped += excess
+            self._cond.notify_all()
+            return True
+
+    def read(self, max_bytes: Optional[int] = None,
+             timeout: Optional[float] = None) -> Optional[memoryview]:
+        """Get the next unread audio without copying it
+
+        releases the previously returned view
+
+        Args:
+            max_bytes: max size of the returned view, by default everything contiguous
+            timeout: max seconds to wait for audio
+        Returns:
+            a view into the buffer, empty on timeout, None once closed and fully read
+        """
+        with self._cond:
+            self._release()
+            self._drain_spill()
+            while self._tail == self._read and not self._closed:
+                if not self._cond.wait(timeout):
+                    return memoryview(b"")
+            if self._tail == self._read:
+                return None
+            self.max_lag = max(self.max_lag, self.lag)
+            idx = self._read % self.capacity
+            n = min(self._tail - self._read, self.capacity - idx)
+            if max_bytes:
+                n = min(n, max_bytes)
+            self._read += n
+            return memoryview(self._buf)[idx:idx + n]
+
+    def _release(self):
+        if self._head != self._read:
+            self._head = self._read
+            self._cond.notify_all()
+
+    def release(self):
+        """Hand the view returned by read back to the writer"""
+        with self._cond:
+            self._release()
+
+    def close(self):
+        """End of stream, the reader gets the remaining audio and then None"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # queue.Queue compatibility, None marks the end of the stream
+    def put(self, data: Optional[bytes], block: bool = True, timeout: Optional[float] = None):
+        if data is None:
+            self.close()
+        else:
+            self.write(data, timeout)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Optional[bytes]:
+        """raises queue.Empty if no audio arrives in time, returns None at the end of the stream"""
+        view = self.read(timeout=timeout if block else 0)
+        if view is None:
+            return None
+        if not view:
+            raise Empty
+        return bytes(view)
+
+    def task_done(self):
+        pass
@@ -0,0 +1,208 @@
+"""
+Offline STT evaluation and throughput benchmark
+
+transcribes a directory of .wav files, each with a .txt reference transcript
+of the same name, and reports real time factor, latency percentiles, peak
+memory (including worker processes) and word/character error rates as json
+
+    python -m ovos_plugin_manager.utils.stt_benchmark <directory> --module <stt plugin> --lang en-US
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from ovos_plugin_manager.utils.audio import AudioData
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def normalize_transcript(text: str) -> str:
+    """lowercase and strip punctuation so only recognition errors are counted"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def edit_distance(ref: Sequence, hyp: Sequence) -> int:
+    """levenshtein distance between two sequences"""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1,  # deletion
+                         cur[j - 1] + 1,  # insertion
+                         prev[j - 1] + (r != h))  # substitution
+        prev = cur
+    return prev[-1]
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref = normalize_transcript(reference).split()
+    hyp = normalize_transcript(hypothesis).split()
+    if not ref:
+        return float(bool(hyp))
+    return edit_distance(ref, hyp) / len(ref)
+
+
+def char_error_rate(reference: str, hypothesis: str) -> float:
+    ref = normalize_transcript(reference)
+    hyp = normalize_transcript(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    return edit_distance(ref, hyp) / len(ref)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """nearest rank percentile"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = math.ceil(pct / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """peak resident memory in MB, None if unknown
+
+    @param children: measure the largest child process that has terminated and
+        been waited for, eg. the workers of a process pool, instead of this process
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = resource.getrusage(who).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def load_dataset(directory: str) -> List[dict]:
+    """list the .wav files in a directory that have a .txt reference transcript"""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".wav"):
+            continue
+        ref_path = os.path.join(directory, name[:-4] + ".txt")
+        if not os.path.isfile(ref_path):
+            continue
+        with open(ref_path) as f:
+            reference = f.read().strip()
+        samples.append({"file": name, "path": os.path.join(directory, name),
+                        "reference": reference})
+    return samples
+
+
+def benchmark_stt(stt, directory: str, lang: Optional[str] = None,
+                  workers: int = 1) -> dict:
+    """
+    Transcribe every sample of a dataset and measure speed and accuracy
+
+    @param stt: STT plugin, or anything with a transcribe(audio, lang) method such as a STTWorkerPool
+    @param directory: folder with .wav files and .txt reference transcripts
+    @param lang: language of the dataset
+    @param workers: number of transcriptions running in parallel
+    @return: json serializable report with a "summary" and per file "results"
+    """
+    samples = load_dataset(directory)
+    audios = [AudioData.from_file(s["path"]) for s in samples]
+
+    def _run(idx: int) -> dict:
+        audio = audios[idx]
+        start = time.perf_counter()
+        transcriptions = stt.transcribe(audio, lang)
+        latency = time.perf_counter() - start
+        hypothesis = transcriptions[0][0] if transcriptions and transcriptions[0][0] else ""
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        reference = samples[idx]["reference"]
+        return {"file": samples[idx]["file"],
+                "reference": reference,
+                "hypothesis": hypothesis,
+                "duration": duration,
+                "latency": latency,
+                "rtf": latency / duration if duration else 0.0,
+                "wer": word_error_rate(reference, hypothesis),
+                "cer": char_error_rate(reference, hypothesis)}
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run, range(len(samples))))
+    else:
+        results = [_run(idx) for idx in range(len(samples))]
+    wall_time = time.perf_counter() - start
+
+    audio_seconds = sum(r["duration"] for r in results)
+    latencies = [r["latency"] for r in results]
+    ref_words = sum(len(normalize_transcript(r["reference"]).split()) for r in results)
+    ref_chars = sum(len(normalize_transcript(r["reference"])) for r in results)
+    summary = {
+        "files": len(results),
+        "workers": workers,
+        "audio_seconds": audio_seconds,
+        "wall_time": wall_time,
+        # processing time per second of audio, < 1 is faster than real time
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else 0.0,
+        "throughput_rtf": wall_time / audio_seconds if audio_seconds else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "peak_rss_mb": peak_rss_mb(),
+        # which processes peak_rss_mb covers, workers in other processes are
+        # only measured once they exited, see main
+        "peak_rss_scope": "self",
+        # corpus level error rates, weighted by reference length
+        "wer": sum(r["wer"] * len(normalize_transcript(r["reference"]).split())
+                   for r in results) / ref_words if ref_words else 0.0,
+        "cer": sum(r["cer"] * len(normalize_transcript(r["reference"]))
+                   for r in results) / ref_chars if ref_chars else 0.0,
+    }
+    return {"summary": summary, "results": results}
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="benchmark a STT plugin on a folder of "
+                                                 ".wav files with .txt reference transcripts")
+    parser.add_argument("directory")
+    parser.add_argument("--module", required=True, help="STT plugin to load")
+    parser.add_argument("--lang", default="en-US")
+    parser.add_argument("--config", default="{}", help="plugin config as a json string")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parallel transcriptions, each worker gets its own plugin instance")
+    parser.add_argument("--processes", action="store_true",
+                        help="run the workers in separate processes")
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    args = parser.parse_args(args)
+
+    from ovos_plugin_manager.stt import OVOSSTTFactory
+    plugin_config = json.loads(args.config)
+    config = {"lang": args.lang, "module": args.module, args.module: plugin_config}
+    if args.workers > 1:
+        stt = OVOSSTTFactory.create_pool(config, args.workers, args.processes)
+    else:
+        stt = OVOSSTTFactory.create(config)
+    report = benchmark_stt(stt, args.directory, args.lang, args.workers)
+    report["summary"]["module"] = args.module
+    report["summary"]["config"] = plugin_config
+    if args.workers > 1:
+        stt.shutdown()
+        if args.processes:
+            # the worker processes are joined now, their usage is known
+            report["summary"]["peak_rss_children_mb"] = peak_rss_mb(children=True)
+            report["summary"]["peak_rss_scope"] = "self+children"
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
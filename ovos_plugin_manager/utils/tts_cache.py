@@ -1,23 +1,68 @@
 import hashlib
+import heapq
+import itertools
 import json
 import os
 from os.path import join, isdir
+import re
 import shutil
+import struct
+import time
+import unicodedata
+from collections import deque
 from pathlib import Path
-from stat import S_ISREG, ST_MTIME, ST_MODE, ST_SIZE
+from threading import RLock, Event, Thread
+from typing import Dict, List, Optional, Tuple
 
 from ovos_config.locations import get_xdg_cache_save_path
 from ovos_utils.file_utils import get_cache_directory as get_tmp_cache_dir
 from ovos_utils.log import LOG
 
 
-def hash_sentence(sentence: str):
+_SSML_TAG = re.compile(r"<[^>]*>")
+_TAG_SPACES = re.compile(r"\s*=\s*|\s+")
+
+
+def _canonical_tag(match) -> str:
+    """collapse the whitespace inside a single SSML tag"""
+    inner = match.group(0)[1:-1].strip()
+    inner = _TAG_SPACES.sub(lambda m: "=" if "=" in m.group(0) else " ", inner)
+    return f"<{inner.replace(' /', '/')}>"
+
+
+def normalize_sentence(sentence: str, whitespace: bool = True, unicode: bool = True,
+                       casefold: bool = False, ssml: bool = True) -> str:
+    """Normalize a sentence before hashing, so trivial variants share a cache entry
+
+    Args:
+        sentence: The sentence to be cached
+        whitespace: strip and collapse consecutive whitespace
+        unicode: apply unicode NFC normalization
+        casefold: ignore casing, only safe if the TTS engine does too
+        ssml: collapse whitespace inside SSML tags
+    """
+    if unicode:
+        sentence = unicodedata.normalize("NFC", sentence)
+    if ssml and "<" in sentence:
+        sentence = _SSML_TAG.sub(_canonical_tag, sentence)
+    if whitespace:
+        sentence = " ".join(sentence.split())
+    if casefold:
+        sentence = sentence.casefold()
+    return sentence
+
+
+def hash_sentence(sentence: str, algo: str = "md5"):
     """Convert the sentence into a hash value used for the file name
 
     Args:
         sentence: The sentence to be cached
+        algo: "md5" (default, compatible with existing caches) or "blake2b",
+              a faster hash with a short 20 character digest
     """
     encoded_sentence = sentence.encode("utf-8", "ignore")
+    if algo == "blake2b":
+        return hashlib.blake2b(encoded_sentence, digest_size=10).hexdigest()
     sentence_hash = hashlib.md5(encoded_sentence).hexdigest()
     return sentence_hash
 
@@ -64,27 +109,37 @@ def _get_cache_entries(directory):
     Returns:
         (tuple) (modification time, size, filepath)
     """
-    entries = (os.path.join(directory, fn) for fn in os.listdir(directory))
-    entries = ((os.stat(path), path) for path in entries)
-
-    # leave only regular files, insert modification date
-    return ((stat[ST_MTIME], stat[ST_SIZE], path)
-            for stat, path in entries if S_ISREG(stat[ST_MODE]))
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # deleted meanwhile
+            yield int(stat.st_mtime), stat.st_size, entry.path
 
 
-def _delete_oldest(entries, bytes_needed):
+def _delete_oldest(entries, bytes_needed, rate_limit=0):
     """Delete files with oldest modification date until space is freed.
 
+    Only the files actually deleted are popped from a heap, instead of
+    sorting every entry
+
     Args:
         entries (tuple): file + file stats tuple
         bytes_needed (int): disk space that needs to be freed
+        rate_limit (float): maximum deletions per second, 0 for unlimited
 
     Returns:
         (list) all removed paths
     """
     deleted_files = []
     space_freed = 0
-    for moddate, fsize, path in sorted(entries):
+    heap = list(entries)
+    heapq.heapify(heap)
+    while heap:
+        moddate, fsize, path = heapq.heappop(heap)
         try:
             os.remove(path)
             space_freed += fsize
@@ -94,11 +149,39 @@ def _delete_oldest(entries, bytes_needed):
 
         if space_freed > bytes_needed:
             break  # deleted enough!
+        if rate_limit:
+            time.sleep(1 / rate_limit)
 
     return deleted_files
 
 
-def curate_cache(directory, min_free_percent=5.0, min_free_disk=50):
+def _bytes_to_free(directory, min_free_percent=5.0, min_free_disk=50):
+    """Disk space that needs to be freed for the curation limits to be respected.
+
+    Args:
+        directory (str): path on the drive to check
+        min_free_percent (float): percentage (0.0-100.0) of drive to keep free
+        min_free_disk (float): minimum allowed disk space in MB
+
+    Returns:
+        (int) bytes to free, 0 if there is enough free space
+    """
+    if not isdir(directory):
+        raise NotADirectoryError(directory)
+
+    # Get the disk usage statistics bout the given path
+    space = shutil.disk_usage(directory)
+
+    percent_free = space.free * 100 / space.total
+
+    if percent_free < min_free_percent and space.free < mb_to_bytes(min_free_disk):
+        # calculate how many bytes we need to delete
+        bytes_needed = (min_free_percent - percent_free) / 100.0 * space.total
+        return int(bytes_needed + 1.0)
+    return 0
+
+
+def curate_cache(directory, min_free_percent=5.0, min_free_disk=50, rate_limit=0):
     """Clear out the directory if needed.
 
     The curation will only occur if both the precentage and actual disk space
@@ -111,38 +194,28 @@ def curate_cache(directory, min_free_percent=5.0, min_free_disk=50):
                                   default is 5% if not specified.
         min_free_disk (float): minimum allowed disk space in MB, default
                                value is 50 MB if not specified.
+        rate_limit (float): maximum deletions per second, default is
+                            unlimited
     """
     # Simpleminded implementation -- keep a certain percentage of the
     # disk available.
     # TODO: Would be easy to add more options, like whitelisted files, etc.
     deleted_files = []
 
-    if not isdir(directory):
-        raise NotADirectoryError(directory)
-
-    # Get the disk usage statistics bout the given path
-    space = shutil.disk_usage(directory)
-
-    percent_free = space.free * 100 / space.total
-
-    min_free_disk = mb_to_bytes(min_free_disk)
-
-    if percent_free < min_free_percent and space.free < min_free_disk:
+    bytes_needed = _bytes_to_free(directory, min_free_percent, min_free_disk)
+    if bytes_needed:
         LOG.info('Low diskspace detected, cleaning cache')
-        # calculate how many bytes we need to delete
-        bytes_needed = (min_free_percent - percent_free) / 100.0 * space.total
-        bytes_needed = int(bytes_needed + 1.0)
-
         # get all entries in the directory w/ stats
         entries = _get_cache_entries(directory)
         # delete as many as needed starting with the oldest
-        deleted_files = _delete_oldest(entries, bytes_needed)
+        deleted_files = _delete_oldest(entries, bytes_needed, rate_limit)
 
     return deleted_files
 
 
 class AudioFile:
     def __init__(self, cache_dir: Path, sentence_hash: str, file_type: str):
+        self.sentence_hash = sentence_hash
         self.name = f"{sentence_hash}.{file_type}"
         if isinstance(cache_dir, str):
             cache_dir = Path(cache_dir)
@@ -178,17 +251,80 @@ class AudioFile:
         return str(self.path)
 
 
+class VisemeFile:
+    """Visemes precomputed at synthesis time, stored as packed code/duration arrays
+
+    layout: magic, uint32 count, count single char viseme codes, count float64 durations
+    """
+    MAGIC = b"OVIS"
+
+    def __init__(self, cache_dir: Path, sentence_hash: str):
+        self.sentence_hash = sentence_hash
+        self.name = f"{sentence_hash}.vis"
+        if isinstance(cache_dir, str):
+            cache_dir = Path(cache_dir)
+        self.path = cache_dir.joinpath(self.name)
+        self.visemes = None
+
+    def load(self) -> Optional[List[Tuple[str, float]]]:
+        """Load visemes from cache file, the file is only read once"""
+        if self.visemes is None and self.path.exists():
+            try:
+                with open(self.path, "rb") as viseme_file:
+                    data = viseme_file.read()
+                if data[:4] != self.MAGIC:
+                    raise ValueError("not a viseme file")
+                n, = struct.unpack_from("<I", data, 4)
+                codes = data[8:8 + n].decode("ascii")
+                durations = struct.unpack_from(f"<{n}d", data, 8 + n)
+                self.visemes = list(zip(codes, durations))
+            except Exception:
+                LOG.exception(f"Failed to read {self.name} visemes from cache")
+        return self.visemes
+
+    def save(self, visemes: List[Tuple[str, float]]) -> bool:
+        """Write a TTS cache file containing the mouth movements for a sentence.
+        Args:
+            visemes: list of (viseme code, duration) tuples
+        Returns:
+            False if the visemes can not be packed, eg. multi char codes
+        """
+        try:
+            codes = "".join(code for code, _ in visemes).encode("ascii")
+            if len(codes) != len(visemes):
+                return False
+            n = len(visemes)
+            rec = struct.pack(f"<4sI{n}s{n}d", self.MAGIC, n, codes,
+                              *(float(dur) for _, dur in visemes))
+            with open(self.path, "wb") as viseme_file:
+                viseme_file.write(rec)
+        except Exception:
+            LOG.error(f"Failed to write {self.name} to cache")
+            return False
+        self.visemes = list(visemes)
+        return True
+
+    def exists(self):
+        return self.path.exists()
+
+    def __str__(self):
+        return str(self.path)
+
+
 class PhonemeFile:
     def __init__(self, cache_dir: Path, sentence_hash: str):
+        self.sentence_hash = sentence_hash
         self.name = f"{sentence_hash}.pho"
         if isinstance(cache_dir, str):
             cache_dir = Path(cache_dir)
         self.path = cache_dir.joinpath(self.name)
         self.phonemes = None
+        # mouth movements, stored next to the phonemes they are derived from
+        self.visemes = VisemeFile(cache_dir, sentence_hash)
 
     def load(self):
-        """Load phonemes from cache file."""
-        if self.path.exists():
+        """Load phonemes from cache file, the file is only parsed once"""
+        if self.phonemes is None and self.path.exists():
             try:
                 with open(self.path) as phoneme_file:
                     phonemes = phoneme_file.read().strip()
@@ -217,6 +353,125 @@ class PhonemeFile:
         return str(self.path)
 
 
+class UtteranceCounter:
+    """Bounded and decaying frequency counter of spoken sentences, persisted to disk
+
+    Counts decay continuously and exponentially with the given half-life,
+    when more than max_entries sentences are tracked the least frequent ones
+    are dropped
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1000,
+                 half_life_days: float = 7.0, save_interval: float = 60.0):
+        """
+        Args:
+            path: json file the counts are persisted to, None to keep them in memory only
+            max_entries: maximum number of sentences tracked
+            half_life_days: days for a count to decay to half its value, 0 disables decay
+            save_interval: minimum seconds between automatic saves
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.half_life = half_life_days
+        self.save_interval = save_interval
+        self._counts: Dict[str, list] = {}  # sentence_hash -> [count, last update]
+        self._last_save = time.time()
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _decayed(self, count: float, updated: float, now: float) -> float:
+        if not self.half_life:
+            return count
+        elapsed = max(now - updated, 0)
+        # rounded so the drift between quick successive uses does not keep
+        # N uses just below a threshold of N
+        return round(count * 0.5 ** (elapsed / (self.half_life * 86400)), 6)
+
+    def get(self, sentence_hash: str) -> float:
+        """Current (decayed) count of a sentence"""
+        if sentence_hash not in self._counts:
+            return 0.0
+        return self._decayed(*self._counts[sentence_hash], time.time())
+
+    def increment(self, sentence_hash: str) -> float:
+        """Count a new use of a sentence, returns the updated count"""
+        now = time.time()
+        count, updated = self._counts.get(sentence_hash, (0.0, now))
+        count = self._decayed(count, updated, now) + 1
+        self._counts[sentence_hash] = [count, now]
+        if len(self._counts) > self.max_entries:
+            self._evict(now)
+        self._dirty = True
+        if now - self._last_save > self.save_interval:
+            self.save()
+        return count
+
+    def _evict(self, now: float):
+        """Drop the least frequent sentences, freeing 10% of the capacity"""
+        n = len(self._counts) - int(self.max_entries * 0.9)
+        ranked = sorted(self._counts,
+                        key=lambda k: self._decayed(*self._counts[k], now))
+        for sentence_hash in ranked[:n]:
+            self._counts.pop(sentence_hash, None)
+
+    def load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._counts = {k: list(v) for k, v in json.load(f).items()}
+        except Exception:
+            LOG.exception(f"Failed to load utterance counts from {self.path}")
+
+    def save(self):
+        """Atomically write the counts to disk, if changed"""
+        self._last_save = time.time()
+        if not self.path or not self._dirty:
+            return
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(dict(self._counts), f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except Exception:
+            LOG.exception(f"Failed to save utterance counts to {self.path}")
+
+
+class _TransformedContextFile:
+    """Context changes made by a TTSTransformers chain, stored next to the transformed audio"""
+
+    def __init__(self, audio_file: AudioFile):
+        self.name = f"{audio_file.sentence_hash}.json"
+        self.path = audio_file.path.parent.joinpath(self.name)
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, context: dict):
+        try:
+            with open(self.path, "w") as f:
+                json.dump(context, f)
+        except TypeError:
+            # not serializable, the entry is only usable during this run
+            LOG.debug(f"TTS transformers context can not be cached: {list(context)}")
+            if self.exists():
+                self.path.unlink()
+
+    def exists(self):
+        return self.path.exists()
+
+    def __str__(self):
+        return str(self.path)
+
+
 class TextToSpeechCache:
     """Class for all persistent and temporary caching operations."""
 
@@ -234,24 +489,213 @@ class TextToSpeechCache:
         self.persistent_cache_dir = Path(persistent_cache)
         self.temporary_cache_dir = Path(tmp_cache)
         self.cached_sentences = {}
+        # entries found on disk at startup, they may be keyed by the md5 of
+        # the raw sentence used by older versions
+        self.legacy_entries = set()
         # curate cache if disk usage is above min %
         self.min_free_percent = self.config.get("min_free_percent", 75)
         # save to permanent cache settings
         self.persist = self.config.get("persist_cache", False)
         # only persist if utterance is spoken >= N times
         self.persist_thresh = self.config.get("persist_thresh", 1)
-        self._sentence_count = {}
+        self._sentence_count = UtteranceCounter(
+            str(self.persistent_cache_dir.joinpath("utterance_counts.json")) if self.persist else None,
+            max_entries=self.config.get("persist_counter_size", 1000),
+            half_life_days=self.config.get("persist_half_life_days", 7.0))
+        # audio after TTSTransformers, stored per transformers chain
+        self.transformed_sentences = {}  # "chain_id/sentence_hash" -> (AudioFile, context)
+        # usage tracking of the temporary cache, see TTSCacheManager
+        self.manager: Optional["TTSCacheManager"] = None
+        self.bytes_used = 0
+        self._entry_sizes = {}  # sentence_hash -> bytes in temporary cache
+        self._last_used = {}  # sentence_hash -> timestamp
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # shared with the manager, guards the index against background eviction
+        self._lock = RLock()
         self.load_persistent_cache()
 
     def __contains__(self, sha):
         """The cache contains a SHA if it knows of it and it exists on disk."""
-        if sha not in self.cached_sentences:
+        # single lookup, entries may be removed by background curation
+        cached = self.cached_sentences.get(sha)
+        if cached is None:
             return False  # Doesn't know of it
-        else:
-            # Audio file must exist, phonemes are optional.
-            audio, phonemes = self.cached_sentences[sha]
-            return (audio.exists() and
-                    (phonemes is None or phonemes.exists()))
+        # Audio file must exist, phonemes are optional.
+        audio, phonemes = cached
+        return (audio.exists() and
+                (phonemes is None or phonemes.exists()))
+
+    def lookup(self, sentence_hash: str) -> Optional[tuple]:
+        """Get a cached sentence and register the cache hit
+
+        the entry is protected from eviction until it had time to be played
+
+        Returns:
+            tuple: (AudioFile, PhonemeFile or None), None if not cached
+        """
+        with self._lock:
+            cached = self.cached_sentences.get(sentence_hash)
+            if cached is None:
+                return None
+            audio, phonemes = cached
+            if not audio.exists() or (phonemes is not None and not phonemes.exists()):
+                return None
+            if self.manager is not None:
+                self.manager.protect(self, sentence_hash)
+            self.touch(sentence_hash)
+            return cached
+
+    def is_temporary(self, sentence_hash: str) -> bool:
+        """True if the cached audio lives in the temporary cache directory"""
+        cached = self.cached_sentences.get(sentence_hash)
+        if cached is None:
+            return False
+        return Path(cached[0].path).parent == self.temporary_cache_dir
+
+    def touch(self, sentence_hash: str):
+        """Register a cache hit for a sentence
+
+        frequently used sentences are promoted to the persistent cache"""
+        with self._lock:
+            self.stats["hits"] += 1
+            self._last_used[sentence_hash] = time.time()
+            if self.persist:
+                self._sentence_count.increment(sentence_hash)
+                if self._should_persist(sentence_hash) and self.is_temporary(sentence_hash):
+                    self.promote(sentence_hash)
+
+    def _entry_files(self, sentence_hash: str) -> list:
+        """All files belonging to a cached sentence, including optional viseme files"""
+        transformed = self.transformed_sentences.get(sentence_hash)
+        if transformed is not None:
+            audio_file = transformed[0]
+            return [audio_file, _TransformedContextFile(audio_file)]
+        files = []
+        for f in self.cached_sentences.get(sentence_hash) or ():
+            if f is None:
+                continue
+            files.append(f)
+            if isinstance(f, PhonemeFile) and f.visemes.exists():
+                files.append(f.visemes)
+        return files
+
+    def promote(self, sentence_hash: str) -> bool:
+        """Move an already synthesized sentence from the temporary to the persistent cache
+
+        all files of the entry are moved or none, files are copied under a
+        temporary name first and only renamed once all of them made it
+
+        Returns:
+            True if the entry is now in the persistent cache
+        """
+        with self._lock:
+            files = self._entry_files(sentence_hash)
+            placed = {}  # file -> current path, for rollback
+            try:
+                staged = []
+                for f in files:
+                    tmp = self.persistent_cache_dir.joinpath(f.name + ".part")
+                    shutil.move(str(f.path), str(tmp))
+                    placed[f] = tmp
+                    staged.append((f, tmp))
+                for f, tmp in staged:
+                    dst = self.persistent_cache_dir.joinpath(f.name)
+                    os.replace(tmp, dst)
+                    placed[f] = dst
+            except OSError as e:
+                LOG.error(f"Failed to promote {sentence_hash} to persistent cache: {e}")
+                for f, path in placed.items():
+                    try:
+                        shutil.move(str(path), str(f.path))
+                    except OSError:
+                        LOG.exception(f"Failed to restore {f.path}")
+                return False
+            for f, dst in placed.items():
+                f.path = dst
+            # no longer counts towards the temporary cache budget
+            self.bytes_used -= self._entry_sizes.pop(sentence_hash, 0)
+            LOG.debug(f"Promoted to persistent TTS cache: {[f.name for f in files]}")
+            return True
+
+    def track(self, sentence_hash: str):
+        """Register a newly cached sentence, accounting its size towards the cache budget"""
+        with self._lock:
+            self.stats["misses"] += 1
+            self._last_used[sentence_hash] = time.time()
+            if sentence_hash not in self.cached_sentences or \
+                    not self.is_temporary(sentence_hash):
+                return
+            size = 0
+            for f in self._entry_files(sentence_hash):
+                if f.exists():
+                    size += os.path.getsize(f.path)
+            self.bytes_used += size - self._entry_sizes.get(sentence_hash, 0)
+            self._entry_sizes[sentence_hash] = size
+        if self.manager is not None:
+            self.manager.on_insert(self, sentence_hash)
+
+    def _forget(self, sentence_hash: str):
+        """Drop a sentence from the cache index and usage accounting"""
+        with self._lock:
+            self.cached_sentences.pop(sentence_hash, None)
+            self.transformed_sentences.pop(sentence_hash, None)
+            self._last_used.pop(sentence_hash, None)
+            self.bytes_used -= self._entry_sizes.pop(sentence_hash, 0)
+
+    def evict(self, sentence_hash: str):
+        """Delete a sentence from the temporary cache"""
+        with self._lock:
+            if sentence_hash not in self.cached_sentences and \
+                    sentence_hash not in self.transformed_sentences:
+                return
+            for f in self._entry_files(sentence_hash):
+                if f.exists():
+                    try:
+                        f.path.unlink()
+                    except OSError as e:
+                        LOG.warning(f"Failed to delete {f}: {e}")
+            self._forget(sentence_hash)
+            self.stats["evictions"] += 1
+
+    def rename(self, old_hash: str, new_hash: str) -> bool:
+        """Move a cached sentence to a new key, eg. when the cache key format changes
+
+        if the files can not be moved (eg. a read-only pre-loaded cache) they are
+        kept under the old name and the new key is added to the index as an alias
+
+        Returns:
+            True if the files were renamed, False if the entry was aliased or is unknown
+        """
+        with self._lock:
+            cached = self.cached_sentences.get(old_hash)
+            if cached is None:
+                return False
+            moved = []  # (file, old name, old path)
+            try:
+                for f in self._entry_files(old_hash):
+                    name = new_hash + f.name[len(old_hash):]
+                    dst = f.path.parent.joinpath(name)
+                    if f.exists():
+                        os.replace(f.path, dst)
+                    moved.append((f, f.name, f.path))
+                    f.sentence_hash, f.name, f.path = new_hash, name, dst
+            except OSError as e:
+                LOG.warning(f"Failed to rename TTS cache entry {old_hash}, aliasing it as {new_hash}: {e}")
+                for f, name, path in reversed(moved):
+                    if f.exists():
+                        try:
+                            os.replace(f.path, path)
+                        except OSError:
+                            LOG.exception(f"Failed to restore {path}")
+                    f.sentence_hash, f.name, f.path = old_hash, name, path
+                self.cached_sentences[new_hash] = cached
+                return False
+            self.cached_sentences[new_hash] = self.cached_sentences.pop(old_hash)
+            if old_hash in self._entry_sizes:
+                self._entry_sizes[new_hash] = self._entry_sizes.pop(old_hash)
+            if old_hash in self._last_used:
+                self._last_used[new_hash] = self._last_used.pop(old_hash)
+            return True
 
     def load_persistent_cache(self):
         """There may be files pre-loaded in the persistent cache directory
@@ -269,6 +713,7 @@ class TextToSpeechCache:
             sentence_hash = file_path.name.split(".")[0]
             audio_file = self.define_audio_file(sentence_hash, persistent=True)
             self.cached_sentences[sentence_hash] = audio_file, None
+            self.legacy_entries.add(sentence_hash)
 
     def _load_existing_phoneme_files(self):
         """Find the TTS phoneme files already in the persistent cache.
@@ -293,21 +738,161 @@ class TextToSpeechCache:
             elif cache_file_path.is_file():
                 cache_file_path.unlink()
 
-    def curate(self):
-        """Remove cache data if disk space is running low."""
+        if self.transformed_cache_dir.is_dir():
+            shutil.rmtree(self.transformed_cache_dir, ignore_errors=True)
+        with self._lock:
+            for key in list(self.transformed_sentences):
+                self._forget(key)
+
+    @property
+    def transformed_cache_dir(self) -> Path:
+        return self.temporary_cache_dir.joinpath("transformed")
+
+    def get_transformed(self, sentence_hash: str, chain_id: str):
+        """Get cached audio already processed by the TTSTransformers chain identified by chain_id
+
+        entries written by a previous run are loaded from disk on first use
+
+        Returns:
+            tuple: (AudioFile, context) or None if not cached
+        """
+        key = f"{chain_id}/{sentence_hash}"
+        with self._lock:
+            cached = self.transformed_sentences.get(key)
+            if cached is None:
+                cached = self._load_transformed(sentence_hash, chain_id)
+                if cached is None:
+                    return None
+                self.transformed_sentences[key] = cached
+                self._track_transformed(key)
+            elif not cached[0].exists():
+                self._forget(key)
+                return None
+            if self.manager is not None:
+                self.manager.protect(self, key)
+            self._last_used[key] = time.time()
+            return cached
+
+    def _load_transformed(self, sentence_hash: str, chain_id: str) -> Optional[tuple]:
+        """Find transformed audio and its context changes on disk"""
+        chain_dir = self.transformed_cache_dir.joinpath(chain_id)
+        for path in chain_dir.glob(f"{sentence_hash}.*"):
+            if path.suffix in (".json", ".part"):
+                continue
+            audio_file = AudioFile(chain_dir, sentence_hash, path.suffix.lstrip("."))
+            context = _TransformedContextFile(audio_file).load()
+            if context is None:
+                return None  # interrupted write, not usable
+            return audio_file, context
+        return None
+
+    def cache_transformed(self, sentence_hash: str, chain_id: str,
+                          wav_file: str, context: dict = None) -> AudioFile:
+        """Store audio processed by the TTSTransformers chain identified by chain_id
+
+        the context changes made by the chain are saved next to the audio,
+        entries count towards the temporary cache budget"""
+        key = f"{chain_id}/{sentence_hash}"
+        file_type = Path(wav_file).suffix.lstrip(".") or self.audio_file_type
+        audio_file = AudioFile(self.transformed_cache_dir.joinpath(chain_id),
+                               sentence_hash, file_type)
+        os.makedirs(audio_file.path.parent, exist_ok=True)
+        with self._lock:
+            if key in self.transformed_sentences:
+                # a different file type from an older run of the chain
+                self.evict(key)
+            if Path(wav_file) != audio_file.path:
+                shutil.copyfile(wav_file, audio_file.path)
+            context = dict(context or {})
+            _TransformedContextFile(audio_file).save(context)
+            self.transformed_sentences[key] = (audio_file, context)
+            self._last_used[key] = time.time()
+            self._track_transformed(key)
+        return audio_file
+
+    def _track_transformed(self, key: str):
+        """Account a transformed entry towards the cache budget"""
+        with self._lock:
+            size = 0
+            for f in self._entry_files(key):
+                if f.exists():
+                    size += os.path.getsize(f.path)
+            self.bytes_used += size - self._entry_sizes.get(key, 0)
+            self._entry_sizes[key] = size
+            self._last_used.setdefault(key, time.time())
+        if self.manager is not None:
+            self.manager.on_insert(self, key)
+
+    def curate(self, rate_limit=0):
+        """Remove cache data if disk space is running low.
+
+        Args:
+            rate_limit (float): maximum deletions per second, 0 for unlimited
+        """
+        self._sentence_count.save()
         try:
-            files_removed = curate_cache(str(self.temporary_cache_dir),
-                                         min_free_percent=self.min_free_percent)
+            bytes_needed = _bytes_to_free(str(self.temporary_cache_dir),
+                                          min_free_percent=self.min_free_percent)
         except NotADirectoryError:
             LOG.info(f"Nothing to curate")
             return
-        hashes = set([hash_from_path(Path(path)) for path in files_removed])
-        for sentence_hash in hashes:
-            if sentence_hash in self.cached_sentences:
-                self.cached_sentences.pop(sentence_hash)
+        if not bytes_needed:
+            return
+        LOG.info('Low diskspace detected, cleaning cache')
+        # indexed entries go through eviction, so audio about to be played is kept
+        freed = self.evict_lru(bytes_needed, rate_limit)
+        if freed < bytes_needed:
+            # files unknown to the index, eg. left behind by a previous run.
+            # recent files may belong to a synthesis that was not indexed yet
+            with self._lock:
+                indexed = {str(f.path) for sha in
+                           list(self.cached_sentences) + list(self.transformed_sentences)
+                           for f in self._entry_files(sha)}
+            dirs = [self.temporary_cache_dir]
+            if self.transformed_cache_dir.is_dir():
+                dirs += [d for d in self.transformed_cache_dir.iterdir() if d.is_dir()]
+            min_age = time.time() - 60
+            entries = [e for d in dirs for e in _get_cache_entries(str(d))
+                       if e[2] not in indexed and e[0] < min_age]
+            _delete_oldest(entries, bytes_needed - freed, rate_limit)
+
+    def evict_lru(self, bytes_needed: int, rate_limit: float = 0) -> int:
+        """Evict the least recently used temporary entries until bytes_needed are freed
+
+        entries protected by the manager, eg. a cache hit that is about to be
+        played, are never evicted
+
+        Args:
+            bytes_needed: disk space that needs to be freed
+            rate_limit: maximum deletions per second, 0 for unlimited
+
+        Returns:
+            bytes freed
+        """
+        with self._lock:
+            candidates = sorted(self._entry_sizes, key=lambda k: self._last_used.get(k, 0))
+        freed = 0
+        for sentence_hash in candidates:
+            if freed >= bytes_needed:
+                break
+            with self._lock:
+                size = self._entry_sizes.get(sentence_hash)
+                if size is None or (self.manager is not None and
+                                    self.manager.is_protected(self, sentence_hash)):
+                    continue
+                self.evict(sentence_hash)
+                freed += size
+            if rate_limit:
+                time.sleep(1 / rate_limit)
+        return freed
 
     def define_audio_file(self, sentence_hash: str, persistent=False) -> AudioFile:
-        """Build an instance of an object representing an audio file."""
+        """Build an instance of an object representing an audio file.
+
+        Unless persistent is requested explicitly, this counts as a use of
+        the sentence for the persist_thresh promotion policy"""
+        if self.persist and not persistent:
+            self._sentence_count.increment(sentence_hash)
         if persistent or self._should_persist(sentence_hash):
             audio_file = AudioFile(
                 self.persistent_cache_dir, sentence_hash, self.audio_file_type
@@ -327,10 +912,194 @@ class TextToSpeechCache:
         return phoneme_file
 
     def _should_persist(self, sentence_hash: str):
-        if self.persist:
-            if sentence_hash not in self._sentence_count:
-                self._sentence_count[sentence_hash] = 0
-            self._sentence_count[sentence_hash] += 1
-            if self._sentence_count[sentence_hash] >= self.persist_thresh:
-                return True
-        return False
+        return self.persist and \
+            self._sentence_count.get(sentence_hash) >= self.persist_thresh
+
+
+class TTSCacheManager:
+    """Owns all TextToSpeechCache instances and enforces a global size budget
+
+    The budget only applies to the temporary caches, pre-loaded/persistent
+    audio is never evicted. When the budget is exceeded, entries of the
+    voices using more than their fair share (budget / number of voices)
+    are evicted first, least recently used first across all voices,
+    after that any voice is evicted by global recency
+
+    Entries are pushed to an eviction heap on insert, maintenance runs in a
+    background thread and deletes files at most "rate_limit" per second, so
+    the speech path never waits on it
+    """
+
+    def __init__(self, max_mb: Optional[float] = None, background: bool = True,
+                 rate_limit: float = 50, protected: int = 8):
+        """
+        Args:
+            max_mb: global budget in MB, 0 for unlimited. If not set it is read
+                    from the "cache_budget_mb" key of the "tts" config section
+            background: run maintenance in a background thread
+            rate_limit: maximum file deletions per second during background maintenance
+            protected: number of sentences returned by recent cache hits that are never evicted
+        """
+        self.caches: Dict[str, TextToSpeechCache] = {}
+        self._max_mb = max_mb
+        self.background = background
+        self.rate_limit = rate_limit
+        self._lock = RLock()
+        # (last used, seq, cache, sentence_hash), stale entries are skipped lazily
+        self._heap = []
+        self._seq = itertools.count()
+        self._worker: Optional[Thread] = None
+        self._wake = Event()
+        self._curate_requested = False
+        self._budget_requested = False
+        # (id(cache), sentence_hash) of the last insert and of recent cache hits
+        self._inserted = None
+        self._protected = deque(maxlen=protected)
+
+    @property
+    def max_bytes(self) -> int:
+        if self._max_mb is None:
+            from ovos_config import Configuration
+            self._max_mb = Configuration().get("tts", {}).get("cache_budget_mb", 0)
+        return int(mb_to_bytes(self._max_mb or 0))
+
+    @max_bytes.setter
+    def max_bytes(self, val: int):
+        self._max_mb = val / (1024 * 1024)
+
+    @property
+    def bytes_used(self) -> int:
+        return sum(c.bytes_used for c in self.caches.values())
+
+    def register(self, tts_id: str, cache: TextToSpeechCache) -> TextToSpeechCache:
+        """Start managing a cache"""
+        with self._lock:
+            cache.manager = self
+            cache._lock = self._lock
+            self.caches[tts_id] = cache
+        return cache
+
+    def on_insert(self, cache: TextToSpeechCache, sentence_hash: str):
+        """Called by caches when a sentence is added to the temporary cache"""
+        budget = self.max_bytes
+        if not budget:
+            return
+        with self._lock:
+            heapq.heappush(self._heap, (cache._last_used.get(sentence_hash, 0),
+                                        next(self._seq), cache, sentence_hash))
+            # never evict the sentence that is about to be played
+            self._inserted = (id(cache), sentence_hash)
+        if self.bytes_used > budget:
+            if self.background:
+                self._budget_requested = True
+                self._start_worker()
+            else:
+                self.enforce_budget()
+
+    def protect(self, cache: TextToSpeechCache, sentence_hash: str):
+        """Keep a sentence returned by a cache hit out of the next evictions"""
+        with self._lock:
+            key = (id(cache), sentence_hash)
+            if key not in self._protected:
+                self._protected.append(key)
+
+    def is_protected(self, cache: TextToSpeechCache, sentence_hash: str) -> bool:
+        """True if a sentence was just inserted or returned by a recent cache hit"""
+        with self._lock:
+            key = (id(cache), sentence_hash)
+            return key == self._inserted or key in self._protected
+
+    def _pop_victim(self, budget: int, quota: float, over_quota_only: bool):
+        """Pop the least recently used evictable entry from the heap"""
+        skipped = []
+        victim = None
+        with self._lock:
+            while self._heap and self.bytes_used > budget:
+                entry = heapq.heappop(self._heap)
+                ts, seq, cache, sha = entry
+                if sha not in cache._entry_sizes:
+                    continue  # already evicted, promoted or forgotten
+                last_used = cache._last_used.get(sha, ts)
+                if last_used != ts:  # used again since insert
+                    heapq.heappush(self._heap, (last_used, seq, cache, sha))
+                    continue
+                if self.is_protected(cache, sha) or \
+                        (over_quota_only and cache.bytes_used <= quota):
+                    skipped.append(entry)
+                    continue
+                victim = cache, sha
+                break
+            for entry in skipped:
+                heapq.heappush(self._heap, entry)
+        return victim
+
+    def enforce_budget(self, rate_limit: float = 0):
+        """Evict temporary cache entries until the global budget is respected
+
+        Args:
+            rate_limit: maximum deletions per second, 0 for unlimited
+        """
+        budget = self.max_bytes
+        if not budget or self.bytes_used <= budget:
+            return
+        quota = budget / max(len(self.caches), 1)
+        # first evict from voices over their fair share, then by global recency
+        for over_quota_only in (True, False):
+            while self.bytes_used > budget:
+                # a cache hit can not look the entry up halfway through its eviction
+                with self._lock:
+                    victim = self._pop_victim(budget, quota, over_quota_only)
+                    if victim is None:
+                        break
+                    cache, sha = victim
+                    cache.evict(sha)
+                if rate_limit:
+                    time.sleep(1 / rate_limit)
+
+    def curate(self, rate_limit: float = 0):
+        """Curate every cache by disk usage, then enforce the global budget"""
+        for cache in list(self.caches.values()):
+            cache.curate(rate_limit)
+        self.enforce_budget(rate_limit)
+
+    def curate_async(self):
+        """Schedule curation of all caches in the background thread"""
+        if not self.background:
+            self.curate()
+            return
+        self._curate_requested = True
+        self._start_worker()
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = Thread(target=self._run_worker, daemon=True,
+                                      name="TTSCacheManager")
+                self._worker.start()
+        self._wake.set()
+
+    def _run_worker(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                if self._curate_requested:
+                    self._curate_requested = False
+                    self._budget_requested = False
+                    self.curate(self.rate_limit)
+                elif self._budget_requested:
+                    self._budget_requested = False
+                    self.enforce_budget(self.rate_limit)
+            except Exception as e:
+                LOG.exception(f"TTS cache maintenance failed: {e}")
+
+    def get_stats(self) -> dict:
+        """Aggregate hit/miss/eviction counters and disk usage of all caches"""
+        stats = {"hits": 0, "misses": 0, "evictions": 0,
+                 "bytes_used": 0, "budget_bytes": self.max_bytes, "caches": {}}
+        for tts_id, cache in self.caches.items():
+            for k in ("hits", "misses", "evictions"):
+                stats[k] += cache.stats[k]
+            stats["bytes_used"] += cache.bytes_used
+            stats["caches"][tts_id] = dict(cache.stats, bytes_used=cache.bytes_used)
+        return stats
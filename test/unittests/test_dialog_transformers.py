@@ -0,0 +1,131 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join, isfile
+
+from ovos_plugin_manager.templates.transformers import TTSTransformer
+
+
+class UpperTransformer(TTSTransformer):
+    cacheable = True
+
+    def __init__(self, config=None):
+        super().__init__("upper", config=config or {"gain": 1})
+        self.calls = 0
+
+    def transform(self, wav_file, context=None):
+        self.calls += 1
+        out = wav_file + ".upper.wav"
+        with open(wav_file) as f, open(out, "w") as o:
+            o.write(f.read().upper())
+        context["upper"] = True
+        return out, context
+
+
+class TestTTSTransformersCache(unittest.TestCase):
+    def setUp(self):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        self.tmp = tempfile.mkdtemp()
+        self.cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist")},
+                                       "test-transformers", "wav")
+        self.cache.temporary_cache_dir = self.cache.persistent_cache_dir.parent / "tmp"
+        self.wav = join(self.tmp, "tts.wav")
+        with open(self.wav, "w") as f:
+            f.write("hello")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_chain_id(self):
+        from ovos_plugin_manager.dialog_transformers import get_tts_transformers_chain_id
+        a, b = UpperTransformer(), UpperTransformer({"gain": 2})
+        self.assertEqual(get_tts_transformers_chain_id([a]),
+                         get_tts_transformers_chain_id([UpperTransformer()]))
+        self.assertNotEqual(get_tts_transformers_chain_id([a]),
+                            get_tts_transformers_chain_id([b]))
+        self.assertNotEqual(get_tts_transformers_chain_id([a, b]),
+                            get_tts_transformers_chain_id([b, a]))
+        b.cacheable = False
+        self.assertIsNone(get_tts_transformers_chain_id([a, b]))
+        self.assertIsNone(get_tts_transformers_chain_id([]))
+
+    def test_transform_cached(self):
+        from ovos_plugin_manager.dialog_transformers import transform_tts_audio
+        t = UpperTransformer()
+        out, ctx = transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        self.assertEqual(t.calls, 1)
+        self.assertTrue(ctx["upper"])
+        with open(out) as f:
+            self.assertEqual(f.read(), "HELLO")
+
+        # cache hit skips the transformer but restores context
+        out2, ctx2 = transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        self.assertEqual(t.calls, 1)
+        self.assertEqual(out2, out)
+        self.assertTrue(ctx2["upper"])
+
+        # changing the chain config does not reuse the transformed audio
+        t2 = UpperTransformer({"gain": 3})
+        out3, _ = transform_tts_audio([t2], self.wav, {}, self.cache, "hash")
+        self.assertEqual(t2.calls, 1)
+        self.assertNotEqual(out3, out)
+
+        # other chains are kept, switching back is still a cache hit
+        self.assertTrue(isfile(out))
+        out4, _ = transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        self.assertEqual(t.calls, 1)
+        self.assertEqual(out4, out)
+
+    def test_not_cacheable_by_default(self):
+        from ovos_plugin_manager.dialog_transformers import transform_tts_audio
+
+        class PlainTransformer(UpperTransformer):
+            cacheable = TTSTransformer.cacheable
+
+        t = PlainTransformer()
+        transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        self.assertEqual(t.calls, 2)
+        self.assertEqual(self.cache.transformed_sentences, {})
+
+    def test_persisted_and_budgeted(self):
+        from ovos_plugin_manager.dialog_transformers import transform_tts_audio, \
+            get_tts_transformers_chain_id
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache, TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, background=False)
+        manager.register("a", self.cache)
+        t = UpperTransformer()
+        out, _ = transform_tts_audio([t], self.wav, {}, self.cache, "hash")
+        self.assertGreater(self.cache.bytes_used, 0)
+        self.assertEqual(manager.bytes_used, self.cache.bytes_used)
+
+        # a new instance (eg. after a restart) finds the entry and its context on disk
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist")},
+                                  "test-transformers", "wav")
+        cache.temporary_cache_dir = self.cache.temporary_cache_dir
+        out2, ctx = transform_tts_audio([t], self.wav, {}, cache, "hash")
+        self.assertEqual(t.calls, 1)
+        self.assertEqual(out2, out)
+        self.assertEqual(ctx, {"upper": True})
+        self.assertEqual(cache.bytes_used, self.cache.bytes_used)
+
+        # transformed entries are evicted like any other temporary entry
+        key = f"{get_tts_transformers_chain_id([t])}/hash"
+        self.cache.evict(key)
+        self.assertFalse(isfile(out))
+        self.assertFalse(isfile(out[:-len("wav")] + "json"))
+        self.assertEqual(self.cache.bytes_used, 0)
+
+    def test_cached_context_is_request_scoped(self):
+        from ovos_plugin_manager.dialog_transformers import transform_tts_audio
+        t = UpperTransformer()
+        transform_tts_audio([t], self.wav, {"session": {"session_id": "a"}},
+                            self.cache, "hash")
+        (_, cached_context), = self.cache.transformed_sentences.values()
+        self.assertEqual(cached_context, {"upper": True})
+
+        # a cache hit for another request keeps its own session
+        _, ctx = transform_tts_audio([t], self.wav, {"session": {"session_id": "b"}},
+                                     self.cache, "hash")
+        self.assertEqual(t.calls, 1)
+        self.assertEqual(ctx, {"session": {"session_id": "b"}, "upper": True})
@@ -1,8 +1,15 @@
+import asyncio
+import threading
+import time
 import unittest
+from queue import Queue
 from copy import copy
 
 from unittest.mock import patch, Mock
 from ovos_plugin_manager.utils import PluginTypes, PluginConfigTypes
+from ovos_plugin_manager.templates.stt import STT, StreamThread, StreamingSTT
+from ovos_plugin_manager.utils.audio import AudioData
+from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
 
 
 class TestSTTTemplate(unittest.TestCase):
@@ -19,6 +26,285 @@ class TestSTTTemplate(unittest.TestCase):
         # TODO
     
 
+class DummySTT(STT):
+    available_languages = {"en-US"}
+
+    def execute(self, audio, language=None):
+        return f"{audio}-{language}"
+
+
+class TestSTTBatch(unittest.TestCase):
+    def test_transcribe_batch_order(self):
+        stt = DummySTT({"batch_workers": 3})
+        results = stt.transcribe_batch(["a", "b", "c", "d"], lang="en-US")
+        self.assertEqual([r.text for r in results],
+                         ["a-en-US", "b-en-US", "c-en-US", "d-en-US"])
+        for r in results:
+            self.assertEqual(r.confidence, 1.0)
+            self.assertGreaterEqual(r.elapsed, 0.0)
+
+    def test_transcribe_batch_serial(self):
+        stt = DummySTT({"batch_workers": 1})
+        stt.transcribe = Mock(return_value=[("hello", 0.5)])
+        results = stt.transcribe_batch(["a", "b"])
+        self.assertEqual(stt.transcribe.call_count, 2)
+        self.assertEqual([r.transcriptions for r in results],
+                         [[("hello", 0.5)], [("hello", 0.5)]])
+        self.assertEqual(stt.transcribe_batch([]), [])
+
+    def test_transcribe_batch_serial_by_default(self):
+        stt = DummySTT()
+        with patch("ovos_plugin_manager.templates.stt.ThreadPoolExecutor") as pool:
+            results = stt.transcribe_batch(["a", "b"], lang="en-US")
+        pool.assert_not_called()
+        self.assertEqual([r.text for r in results], ["a-en-US", "b-en-US"])
+
+        class ParallelSTT(DummySTT):
+            batch_workers = 2
+
+        with patch("ovos_plugin_manager.templates.stt.ThreadPoolExecutor") as pool:
+            ParallelSTT().transcribe_batch(["a", "b"], lang="en-US")
+        pool.assert_called_once_with(max_workers=2)
+
+
+class TestSpeculativeSTT(unittest.TestCase):
+    def _get_stt(self, detected, prob, confidences=None):
+        confidences = confidences or {}
+
+        class MultiLangSTT(DummySTT):
+            available_languages = {"en-US", "pt-PT", "es-ES"}
+
+            def transcribe(self, audio, lang=None):
+                if lang == "auto":
+                    return super().transcribe(audio, lang)
+                return [(f"{audio}-{lang}", confidences.get(lang, 0.9))]
+
+        stt = MultiLangSTT({"lang": "en-US", "speculative_langs": 2})
+        stt.config_core = {"secondary_langs": ["pt-PT", "es-ES"]}
+        detector = Mock()
+        detector.detect.return_value = (detected, prob)
+        stt.bind(detector)
+        return stt
+
+    def test_candidates(self):
+        stt = self._get_stt("pt-PT", 0.9)
+        self.assertEqual(stt._speculative_candidates(2), ["en-US", "pt-PT"])
+        self.assertEqual(stt._speculative_candidates(5), ["en-US", "pt-PT", "es-ES"])
+
+    def test_confident_detection(self):
+        stt = self._get_stt("pt-PT", 0.9)
+        self.assertEqual(stt.transcribe("a", "auto"), [("a-pt-PT", 0.9)])
+
+    def test_detected_not_a_candidate(self):
+        stt = self._get_stt("es-ES", 0.9)
+        self.assertEqual(stt.transcribe("a", "auto"), [("a-es-ES", 0.9)])
+
+    def test_combined_score(self):
+        # detector is unsure, the STT is much more confident in english
+        stt = self._get_stt("pt-PT", 0.4, {"en-US": 0.9, "pt-PT": 0.3})
+        self.assertEqual(stt.transcribe("a", "auto"), [("a-en-US", 0.9)])
+
+    def test_disabled(self):
+        stt = self._get_stt("pt-PT", 0.9)
+        stt.config["speculative_langs"] = 0
+        self.assertEqual(stt.transcribe("a", "auto"), [("a-pt-PT", 1.0)])
+
+
+class TestSTTAsync(unittest.TestCase):
+    def setUp(self):
+        STT._async_executor = None
+
+    def tearDown(self):
+        if STT._async_executor is not None:
+            STT._async_executor.shutdown()
+        STT._async_executor = None
+
+    def test_transcribe_async(self):
+        stt = DummySTT()
+        result = asyncio.run(stt.transcribe_async("a", "en-US"))
+        self.assertEqual(result, [("a-en-US", 1.0)])
+
+    def test_backpressure(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        class SlowSTT(DummySTT):
+            def execute(self, audio, language=None):
+                with lock:
+                    running.append(audio)
+                    peak.append(len(running))
+                time.sleep(0.02)
+                with lock:
+                    running.remove(audio)
+                return str(audio)
+
+        stt = SlowSTT()
+        stt.config_core = {"stt": {"async_workers": 4, "async_max_pending": 2}}
+
+        async def main():
+            return await asyncio.gather(*[stt.transcribe_async(i) for i in range(8)])
+
+        results = asyncio.run(main())
+        self.assertEqual([r[0][0] for r in results], [str(i) for i in range(8)])
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(STT._async_executor._max_workers, 4)
+
+
+class DummyStreamThread(StreamThread):
+    def handle_audio_stream(self, audio, language):
+        self.text = b"".join(audio).decode()
+
+    def finalize(self):
+        # wait for the recognizer to consume the whole stream
+        self.join()
+        return self.text
+
+
+class DummyStreamingSTT(StreamingSTT):
+    available_languages = {"en-US"}
+
+    def create_streaming_thread(self):
+        return DummyStreamThread(self.queue, self.lang)
+
+
+class TestStreamingSTT(unittest.TestCase):
+    def test_ring_buffer_stream(self):
+        stt = DummyStreamingSTT({"stream_buffer_seconds": 1, "sample_rate": 8})
+        stt.add_metric = Mock()
+        stt.stream_start("en-US")
+        self.assertIsInstance(stt.queue, AudioRingBuffer)
+        self.assertEqual(stt.queue.capacity, 16)
+        for chunk in (b"hello", b" ", b"world"):
+            stt.stream_data(chunk)
+        self.assertEqual(stt.transcribe(), [("hello world", 1.0)])
+        metric = stt.add_metric.call_args[0][0]
+        self.assertEqual(metric["metric_type"], "stt.stream.lag")
+        self.assertEqual(metric["dropped_bytes"], 0)
+
+    def test_partial_results(self):
+        class PartialStreamThread(DummyStreamThread):
+            def handle_audio_stream(self, audio, language):
+                text = ""
+                for chunk in audio:
+                    text += chunk.decode()
+                    self.emit_partial(text, 0.5)
+                self.text = text
+
+        class PartialSTT(DummyStreamingSTT):
+            def create_streaming_thread(self):
+                return PartialStreamThread(self.queue, self.lang)
+
+        stt = PartialSTT({"stream_buffer_seconds": 1, "sample_rate": 8})
+        received = []
+        stt.on_partial(received.append)
+        stt.stream_start("en-US")
+        stt.stream_data(b"hello")
+        while not received:
+            time.sleep(0.01)
+        self.assertEqual(received[0].text, "hello")
+        self.assertFalse(received[0].is_final)
+        stt.stream_data(b" world")
+        partials = stt.partial_results()
+        self.assertEqual(stt.execute(), "hello world")
+        results = list(partials)
+        self.assertEqual(results[-1].text, "hello world")
+        self.assertTrue(results[-1].is_final)
+        self.assertEqual(received[-1], results[-1])
+
+    def test_recognizer_crash_does_not_block(self):
+        class CrashingStreamThread(DummyStreamThread):
+            def handle_audio_stream(self, audio, language):
+                next(audio)
+                raise RuntimeError("recognizer died")
+
+        class CrashingSTT(DummyStreamingSTT):
+            def create_streaming_thread(self):
+                return CrashingStreamThread(self.queue, self.lang)
+
+        stt = CrashingSTT({"stream_buffer_seconds": 1, "sample_rate": 8})
+        stt.stream_start("en-US")
+        start = time.monotonic()
+        with patch("threading.excepthook"):
+            for _ in range(100):
+                stt.stream_data(b"0123456789")
+            stt.stream.join()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertTrue(stt.queue.closed)
+
+    def test_legacy_queue(self):
+        q = Queue()
+        thread = DummyStreamThread(q, "en-US")
+        q.put(b"ab")
+        q.put(None)
+        thread.start()
+        self.assertEqual(thread.finalize(), "ab")
+
+
+class SlowDummySTT(DummySTT):
+    def execute(self, audio, language=None):
+        time.sleep(0.05)
+        return f"{len(audio.frame_data)}-{language}"
+
+
+class TestSTTWorkerPool(unittest.TestCase):
+    def _check_pool(self, pool):
+        audios = [AudioData(b"\0" * (2 * i + 2), 16000, 2) for i in range(4)]
+        done = pool.get_stats()["requests"]
+        start = time.time()
+        futures = [pool.submit(a, "en-US") for a in audios]
+        results = [f.result() for f in futures]
+        self.assertEqual(results, [[(f"{2 * i + 2}-en-US", 1.0)] for i in range(4)])
+        # two workers, two rounds of requests
+        self.assertLess(time.time() - start, 0.19)
+        stats = pool.get_stats()
+        self.assertEqual(stats["requests"], done + 4)
+        self.assertGreater(stats["max_wait"], 0.0)
+        self.assertGreater(stats["utilization"], 0.0)
+
+    def test_thread_pool(self):
+        from ovos_plugin_manager.stt import STTWorkerPool
+        pool = STTWorkerPool({"lang": "en-US"}, workers=2, clazz=SlowDummySTT)
+        # one plugin instance per worker
+        instances = {id(pool._free.get()), id(pool._free.get())}
+        self.assertEqual(len(instances), 2)
+        pool = STTWorkerPool({"lang": "en-US"}, workers=2, clazz=SlowDummySTT)
+        try:
+            self._check_pool(pool)
+        finally:
+            pool.shutdown()
+
+    def test_process_pool(self):
+        from ovos_plugin_manager.stt import STTWorkerPool
+        pool = STTWorkerPool({"lang": "en-US"}, workers=2, use_processes=True,
+                             clazz=SlowDummySTT)
+        try:
+            # warm up, spawn the worker processes
+            pool.transcribe(AudioData(b"\0\0", 16000, 2))
+            self._check_pool(pool)
+        finally:
+            pool.shutdown()
+
+
+class TestHedgedSTT(unittest.TestCase):
+    def test_hedged_stt(self):
+        from ovos_plugin_manager.stt import HedgedSTT
+        stt = HedgedSTT(SlowDummySTT({"lang": "en-US"}), DummySTT({"lang": "en-US"}),
+                        {"default_delay": 0.01})
+        audio = AudioData(b"\0\0", 16000, 2)
+        self.assertEqual(stt.transcribe(audio, "en-US"), [(f"{audio}-en-US", 1.0)])
+        self.assertEqual(stt.available_languages, {"en-US"})
+
+    @patch("ovos_plugin_manager.stt.OVOSSTTFactory.create")
+    def test_create_hedged(self, create):
+        from ovos_plugin_manager.stt import OVOSSTTFactory, HedgedSTT
+        create.side_effect = lambda config=None: DummySTT(config)
+        config = {"lang": "en-US", "stt": {"module": "a", "fallback_module": "b"}}
+        self.assertIsInstance(OVOSSTTFactory.create_hedged(config), HedgedSTT)
+        config["stt"].pop("fallback_module")
+        self.assertIsInstance(OVOSSTTFactory.create_hedged(config), DummySTT)
+
+
 class TestSTT(unittest.TestCase):
     PLUGIN_TYPE = PluginTypes.STT
     CONFIG_TYPE = PluginConfigTypes.STT
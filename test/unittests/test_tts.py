@@ -1,11 +1,22 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
 import unittest
+import wave
 from unittest.mock import MagicMock
 from unittest.mock import patch, Mock
 
+import numpy as np
+
 from ovos_bus_client.session import Session
 from ovos_utils.fakebus import FakeBus, Message
 
-from ovos_plugin_manager.templates.tts import TTS, TTSContext
+from ovos_plugin_manager.templates.tts import TTS, TTSContext, ConcatTTS, StreamingTTS, \
+    StreamingTTSCallbacks
+from ovos_plugin_manager.utils.tts_cache import hash_sentence
 from ovos_plugin_manager.utils import PluginTypes, PluginConfigTypes
 
 
@@ -52,6 +63,11 @@ class TestTTSTemplate(unittest.TestCase):
         self.assertEqual(tts.validate_ssml(sentence_extra_ssml),
                          "whisper tts")
 
+        # test in-place edits of the supported tags
+        tts.ssml_tags[1] = 'whispered'
+        self.assertEqual(tts.validate_ssml(sentence_extra_ssml),
+                         sentence_extra_ssml)
+
         # test mixed valid / invalid ssml
         tts.ssml_tags = ['speak', 'prosody']
         self.assertEqual(tts.validate_ssml(sentence_bad_ssml), sentence)
@@ -65,6 +81,20 @@ class TestTTSTemplate(unittest.TestCase):
 
         self.assertEqual(TTS.remove_ssml(sentence), sentence_no_ssml)
 
+    def test_ssml_modify_tag(self):
+        class ModifyTTS(TTS):
+            def modify_tag(self, tag):
+                return tag.replace("x-loud", "loud")
+
+        tts = ModifyTTS()
+        tts.ssml_tags = ["speak", "prosody", "break"]
+        # repeated tags are all rewritten, tag names are matched exactly
+        sentence = "<speak><prosody volume='x-loud'>a</prosody> <break/> " \
+                   "<prosody volume='x-loud'>b</prosody><prosodyX>c</prosodyX></speak>"
+        self.assertEqual(tts.validate_ssml(sentence),
+                         "<speak><prosody volume='loud'>a</prosody> <break/> "
+                         "<prosody volume='loud'>b</prosody>c</speak>")
+
     def test_format_speak_tags_with_speech(self):
         valid_output = "<speak>Speak This.</speak>"
         no_tags = TTS.format_speak_tags("Speak This.")
@@ -118,6 +148,36 @@ class TestTTSTemplate(unittest.TestCase):
         tagged_with_exclusion = TTS.format_speak_tags("Don't<speak>Speak This.</speak>But Not this.", False)
         self.assertEqual(tagged_with_exclusion, valid_output)
 
+    def test_phonetic_spellings(self):
+        tts = TTS()  # dummy engine
+        tts.spellings = {"en-US": {"ovos": "oh voss", "jarbas": "jar bass"}}
+        self.assertEqual(tts._replace_phonetic_spellings("OVOS loves jarbas", "en-US"),
+                         "oh voss loves jar bass")
+        # only whole words are replaced
+        self.assertEqual(tts._replace_phonetic_spellings("ovoses jarbas'", "en-US"),
+                         "ovoses jarbas'")
+        self.assertEqual(tts._replace_phonetic_spellings("ovos", "pt-PT"), "ovos")
+
+        # compiled once per language
+        regex = tts._get_spellings_regex("en-US")
+        self.assertIs(tts._get_spellings_regex("en-US"), regex)
+
+        # assigning new spellings recompiles, empty and mixed case keys are handled
+        tts2 = TTS()
+        tts2.spellings = {"en-US": {"ovos": "oh voss", "": "nothing", "Mycroft": "my croft"}}
+        self.assertEqual(tts2._replace_phonetic_spellings("mycroft and ovos", "en-US"),
+                         "my croft and oh voss")
+        self.assertEqual(tts._replace_phonetic_spellings("mycroft", "en-US"), "mycroft")
+        tts.spellings = {"en-US": {"mycroft": "my croft"}}
+        self.assertEqual(tts._replace_phonetic_spellings("mycroft ovos", "en-US"), "my croft ovos")
+
+    def test_load_spellings_per_instance(self):
+        tts, tts2 = TTS(), TTS()
+        self.assertEqual(tts.spellings, tts2.spellings)
+        tts.spellings["en-US"] = {"ovos": "oh voss"}
+        self.assertNotIn("ovos", tts2.spellings.get("en-US", {}))
+        self.assertNotIn("ovos", TTS().spellings.get("en-US", {}))
+
     def test_tts_validator(self):
         from ovos_plugin_manager.templates.tts import TTSValidator
         # TODO
@@ -379,3 +439,407 @@ class TestSession(unittest.TestCase):
         self.assertEqual(ctxt.lang, sess.lang)
         self.assertEqual(ctxt.tts_id, f"{tts.plugin_id}/Daghor/klingon")
         self.assertEqual(ctxt.synth_kwargs, {'lang': 'klingon', 'voice': 'Daghor'})
+
+
+class DummyStreamingTTS(StreamingTTS):
+    def __init__(self, config=None):
+        super().__init__(config or {"lang": "en-US", "enable_streaming": True})
+        self.n_synth = 0
+
+    async def stream_tts(self, sentence, **kwargs):
+        self.n_synth += 1
+        for chunk in (b"RIFF", b"data", b"more"):
+            yield chunk
+
+
+class TestStreamingTTS(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.tts = DummyStreamingTTS({"lang": "en-US",
+                                      "enable_streaming": True,
+                                      "preloaded_cache": self.tmp})
+        self.tts._plugin_id = "dummy-streaming"
+        self.tts.callbacks = MagicMock()
+        self.tts.handle_metric = MagicMock()
+
+    def tearDown(self):
+        TTSContext._caches.pop("dummy-streaming/default/en-US", None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_streamed_audio_is_cached(self):
+        sentence = "streamed sentence"
+        self.tts._execute(sentence, None, False, lang="en-US")
+        self.assertEqual(self.tts.n_synth, 1)
+        self.tts.callbacks.stream_start.assert_called_once()
+        self.tts.callbacks.stream_stop.assert_called_once()
+
+        cache = TTSContext._caches["dummy-streaming/default/en-US"]
+        sentence_hash = hash_sentence(sentence)
+        self.assertIn(sentence_hash, cache)
+        audio_file, _ = cache.cached_sentences[sentence_hash]
+        with open(audio_file.path, "rb") as f:
+            self.assertEqual(f.read(), b"RIFFdatamore")
+        self.assertFalse(os.path.isfile(f"{audio_file.path}.part"))
+
+        metrics = [c.args[0]["metric_type"]
+                   for c in self.tts.handle_metric.call_args_list]
+        self.assertEqual(metrics.count("tts.stream.first_chunk"), 1)
+        self.assertIn("tts.synth.cached", metrics)
+
+    def test_failed_stream_is_not_cached(self):
+        async def broken_stream(sentence, **kwargs):
+            yield b"RIFF"
+            raise RuntimeError("connection lost")
+
+        self.tts.stream_tts = broken_stream
+        wav_file = os.path.join(self.tmp, "broken.wav")
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.tts.generate_audio("broken", wav_file))
+        self.assertFalse(os.path.isfile(wav_file))
+        self.assertFalse(os.path.isfile(f"{wav_file}.part"))
+        self.tts.callbacks.stream_stop.assert_called_once()
+
+
+class TestStreamingTTSCallbacks(unittest.TestCase):
+    def setUp(self):
+        self.out = tempfile.mktemp()
+        play_args = [sys.executable, "-c",
+                     f"import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, open({self.out!r}, 'wb'))"]
+        self.callbacks = StreamingTTSCallbacks(FakeBus(), play_args=play_args,
+                                               tts_config={"persistent_playback": True,
+                                                           "stream_sample_rate": 16000})
+
+    def tearDown(self):
+        self.callbacks.shutdown()
+        if os.path.isfile(self.out):
+            os.remove(self.out)
+
+    def test_player_is_reused(self):
+        self.callbacks.stream_start()
+        process = self.callbacks._process
+        self.callbacks.stream_chunk(b"\x00\x01")
+        self.callbacks.stream_stop()
+        self.callbacks.stream_start()
+        self.assertIs(self.callbacks._process, process)
+        self.callbacks.stream_chunk(b"\x02\x03")
+        self.callbacks.stream_stop()
+        self.callbacks.shutdown()
+        self.assertIsNone(self.callbacks._process)
+        with open(self.out, "rb") as f:
+            self.assertEqual(f.read(), b"\x00\x01\x02\x03")
+
+    def test_raw_play_args(self):
+        self.callbacks.channels = 2
+        args = self.callbacks._raw_play_args("/usr/bin/ffplay")
+        self.assertEqual(args[args.index("-ac") + 1], "2")
+        self.assertNotIn("-ch_layout", args)
+
+    def test_strip_wav_header(self):
+        header = b"RIFF" + (36).to_bytes(4, "little") + b"WAVE" + \
+                 b"fmt " + (16).to_bytes(4, "little") + bytes(16) + \
+                 b"data" + (4).to_bytes(4, "little")
+        self.callbacks._header = b""
+        # header split across chunks is buffered until complete
+        self.assertEqual(self.callbacks._strip_wav_header(header[:20]), b"")
+        self.assertEqual(self.callbacks._strip_wav_header(header[20:] + b"\x01\x02"), b"\x01\x02")
+        self.assertIsNone(self.callbacks._header)
+
+        # raw PCM is passed through untouched
+        self.callbacks._header = b""
+        self.assertEqual(self.callbacks._strip_wav_header(b"\x05\x06"), b"\x05\x06")
+
+
+class DummyConcatTTS(ConcatTTS):
+    def sentence_to_files(self, sentence):
+        return [os.path.join(self.sound_files_path, f"{w}.wav")
+                for w in sentence.split()], None
+
+
+class TestConcatTTS(unittest.TestCase):
+    @staticmethod
+    def _write_unit(path, samples, rate=16000, channels=1):
+        with wave.open(path, "wb") as f:
+            f.setnchannels(channels)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.writeframes(np.array(samples, dtype="<i2").tobytes())
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.tts = DummyConcatTTS(config={"sounds": self.tmp, "rate": "16000", "channels": "1"})
+        self._write_unit(os.path.join(self.tmp, "a.wav"), [1, 2, 3])
+        self._write_unit(os.path.join(self.tmp, "b.wav"), [4, 4, 6, 6], channels=2)
+        self._write_unit(os.path.join(self.tmp, "c.wav"), [10, 20], rate=8000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_concat_in_process(self):
+        out = os.path.join(self.tmp, "out.wav")
+        with patch("ovos_plugin_manager.templates.tts.subprocess") as sp:
+            self.tts.get_tts("a b missing c a", out)
+            sp.check_output.assert_not_called()
+        with wave.open(out, "rb") as f:
+            self.assertEqual(f.getnchannels(), 1)
+            self.assertEqual(f.getframerate(), 16000)
+            samples = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+        # stereo unit downmixed, 8kHz unit upsampled, missing unit skipped
+        self.assertEqual(samples.tolist(), [1, 2, 3, 4, 6, 10, 15, 20, 20, 1, 2, 3])
+        # units are loaded once and reused
+        self.assertEqual(len(self.tts._units), 3)
+
+    def test_concat_multichannel_fallback(self):
+        # stereo to 4 channels has no unambiguous mapping, sox remixes it
+        self.tts.channels = "4"
+        out = os.path.join(self.tmp, "out.wav")
+        with patch("ovos_plugin_manager.templates.tts.subprocess") as sp:
+            self.tts.get_tts("a b", out)
+            sp.check_output.assert_called_once()
+
+    def test_concat_downsample_fallback(self):
+        # linear interpolation would alias, sox resamples with a low-pass filter
+        self._write_unit(os.path.join(self.tmp, "d.wav"), [1, 2, 3, 4, 5, 6], rate=48000)
+        out = os.path.join(self.tmp, "out.wav")
+        with patch("ovos_plugin_manager.templates.tts.subprocess") as sp:
+            self.tts.get_tts("a d", out)
+            sp.check_output.assert_called_once()
+
+    def test_unit_cache_output_format(self):
+        out = os.path.join(self.tmp, "out.wav")
+        self.tts.get_tts("c", out)
+        # units converted for another output format are not reused
+        self.tts.rate = "8000"
+        self.tts.get_tts("c", out)
+        with wave.open(out, "rb") as f:
+            self.assertEqual(f.getframerate(), 8000)
+            samples = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+        self.assertEqual(samples.tolist(), [10, 20])
+        self.assertEqual(len(self.tts._units), 2)
+
+    def test_concat_sox_fallback(self):
+        with open(os.path.join(self.tmp, "d.wav"), "wb") as f:
+            f.write(b"not a wav file")
+        out = os.path.join(self.tmp, "out.wav")
+        with patch("ovos_plugin_manager.templates.tts.subprocess") as sp:
+            self.tts.get_tts("a d", out)
+            sp.check_output.assert_called_once()
+
+
+class DummyBatchTTS(TTS):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.batches = []
+
+    def get_tts(self, sentence, wav_file, lang=None, voice=None):
+        with open(wav_file, "w") as f:
+            f.write(sentence)
+        return wav_file, None
+
+    def get_tts_batch(self, sentences, wav_files, **kwargs):
+        self.batches.append(list(sentences))
+        return [self.get_tts(s, w, **kwargs) for s, w in zip(sentences, wav_files)]
+
+
+class TestHedgedTTS(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        time.sleep(0.3)  # let the primary finish writing
+        TTSContext._caches.pop("slow/default/en-US", None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _get_tts(self):
+        from ovos_plugin_manager.tts import HedgedTTS
+
+        class SlowTTS(DummyBatchTTS):
+            def get_tts(self, sentence, wav_file, lang=None, voice=None):
+                time.sleep(0.3)
+                return super().get_tts(sentence, wav_file)
+
+            def preprocess_sentence(self, sentence):
+                return [sentence.upper()]
+
+        primary = SlowTTS({"lang": "en-US", "preloaded_cache": self.tmp})
+        primary._plugin_id = "slow"
+        primary.spellings = {"en-US": {"ovos": "oh voss"}}
+        return HedgedTTS(primary, DummyBatchTTS({"lang": "en-US"}), {"default_delay": 0.01})
+
+    def test_slow_primary_uses_fallback(self):
+        tts = self._get_tts()
+        wav_file = os.path.join(self.tmp, "hello.wav")
+        path, _ = tts.get_tts("hello", wav_file)
+        # the winner is moved to the requested file
+        self.assertEqual(path, wav_file)
+        with open(path) as f:
+            self.assertEqual(f.read(), "hello")
+
+    def test_transparent_proxy(self):
+        tts = self._get_tts()
+        self.assertEqual(tts.plugin_id, "slow")
+        self.assertIs(tts.config, tts.primary.config)
+        self.assertIs(tts.spellings, tts.primary.spellings)
+        self.assertEqual(tts.preprocess_sentence("hi"), ["HI"])
+        self.assertEqual(tts._replace_phonetic_spellings("ovos", "en-US"), "oh voss")
+
+    def test_fallback_audio_not_cached(self):
+        tts = self._get_tts()
+        ctxt = TTSContext("slow", "en-US", "default", {"lang": "en-US"})
+        audio, _ = tts.synth("hello", ctxt)
+        self.assertTrue(os.path.isfile(audio.path))
+        self.assertNotIn(tts.get_sentence_hash("hello"), ctxt.get_cache().cached_sentences)
+
+
+class TestTTSBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.config = {"lang": "en-US", "preloaded_cache": self.tmp}
+
+    def tearDown(self):
+        TTSContext._caches.pop("dummy-batch/default/en-US", None)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_default_batch_fans_out(self):
+        tts = DummyTTS()
+        self.assertFalse(tts.supports_batch_synth)
+        files = [os.path.join(self.tmp, f"{i}.wav") for i in range(3)]
+        results = tts.get_tts_batch(["a", "b", "c"], files)
+        self.assertEqual(results, [(f, None) for f in files])
+
+    def test_synth_batch_uses_cache(self):
+        tts = DummyBatchTTS(self.config)
+        tts._plugin_id = "dummy-batch"
+        self.assertTrue(tts.supports_batch_synth)
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+
+        results = tts.synth_batch(["one", "two"], ctxt)
+        self.assertEqual(tts.batches, [["one", "two"]])
+        with open(results[1][0].path) as f:
+            self.assertEqual(f.read(), "two")
+
+        # only sentences missing from cache are synthesized
+        results = tts.synth_batch(["two", "three", "one"], ctxt)
+        self.assertEqual(tts.batches[-1], ["three"])
+        self.assertEqual([str(r[0].path) for r in results],
+                         [str(ctxt.get_cache().cached_sentences[hash_sentence(s)][0].path)
+                          for s in ["two", "three", "one"]])
+
+    def test_synth_batch_dedupes(self):
+        tts = DummyBatchTTS(dict(self.config, cache_hash="blake2b"))
+        tts._plugin_id = "dummy-batch"
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+        results = tts.synth_batch(["one", "two", "one", "two  "], ctxt)
+        self.assertEqual(tts.batches, [["one", "two"]])
+        self.assertEqual(len(results), 4)
+        self.assertIs(results[2], results[0])
+        self.assertIs(results[3], results[1])
+
+    def test_normalized_cache_keys(self):
+        tts = DummyBatchTTS(dict(self.config, cache_hash="blake2b"))
+        tts._plugin_id = "dummy-batch"
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+        self.assertEqual(tts.get_sentence_hash("hello  world "),
+                         tts.get_sentence_hash("hello world"))
+
+        tts.synth_batch(["hello world"], ctxt)
+        tts.synth_batch(["hello  world "], ctxt)
+        self.assertEqual(tts.batches, [["hello world"]])
+        # the context computes the same key from the plugin config
+        audio, _ = ctxt.get_from_cache("hello  world ", "wav", tts.config)
+        self.assertTrue(audio.exists())
+
+    def test_cached_visemes(self):
+        tts = DummyBatchTTS(self.config)
+        tts._plugin_id = "dummy-batch"
+        tts.get_tts = lambda sentence, wav_file, **kwargs: (
+            DummyBatchTTS.get_tts(tts, sentence, wav_file)[0], "HH:0.1 AH:0.2")
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+        audio, phonemes = tts.synth("hi", ctxt)
+        expected = tts.viseme(phonemes)
+        pho_file = ctxt.get_cache().cached_sentences[tts.get_sentence_hash("hi")][1]
+        self.assertTrue(pho_file.visemes.exists())
+
+        # cache hits are a lookup, phonemes are not parsed again
+        tts.viseme = Mock()
+        tts.get_sentence_hash = Mock(wraps=tts.get_sentence_hash)
+        self.assertEqual(tts._get_visemes(phonemes, "hi", ctxt, audio.sentence_hash), expected)
+        tts.viseme.assert_not_called()
+        tts.get_sentence_hash.assert_not_called()
+
+        # the phoneme file is parsed once, repeated hits reuse it
+        with patch("ovos_plugin_manager.utils.tts_cache.json.loads") as loads:
+            self.assertEqual(ctxt.get_from_cache("hi", "wav", tts.config,
+                                                 sentence_hash=audio.sentence_hash)[1], phonemes)
+        loads.assert_not_called()
+
+    def test_legacy_cache_key_migration(self):
+        tts = DummyBatchTTS(dict(self.config, cache_hash="blake2b"))
+        tts._plugin_id = "dummy-batch"
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+        cache = ctxt.get_cache()
+        # entry cached by an older version, keyed by md5 of the raw sentence
+        legacy = hash_sentence("legacy")
+        audio = cache.define_audio_file(legacy)
+        os.makedirs(os.path.dirname(str(audio)), exist_ok=True)
+        audio.save(b"legacy")
+        cache.cached_sentences[legacy] = (audio, None)
+        cache.legacy_entries.add(legacy)
+
+        results = tts.synth_batch(["legacy"], ctxt)
+        self.assertEqual(tts.batches, [])
+        self.assertNotIn(legacy, cache)
+        self.assertIn(tts.get_sentence_hash("legacy"), cache)
+        self.assertEqual(results[0][0].load(), b"legacy")
+        self.assertEqual(cache.legacy_entries, set())
+
+    def test_legacy_cache_key_not_computed(self):
+        tts = DummyBatchTTS(self.config)
+        tts._plugin_id = "dummy-batch"
+        ctxt = TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"})
+        cache = ctxt.get_cache()
+        cache.legacy_entries.add("0" * 32)
+        sentence_hash = tts.get_sentence_hash("hello world")
+        with patch("ovos_plugin_manager.templates.tts.hash_sentence",
+                   wraps=hash_sentence) as hasher:
+            # md5 of a normalized sentence is the legacy key
+            tts._in_cache("hello world", sentence_hash, cache)
+            self.assertEqual(hasher.call_count, 0)
+            tts._in_cache("hello  world", sentence_hash + "x", cache)
+            self.assertEqual(hasher.call_count, 1)
+            # nothing left to migrate
+            cache.legacy_entries.clear()
+            tts._in_cache("hello  world", sentence_hash + "x", cache)
+            self.assertEqual(hasher.call_count, 1)
+
+    def test_tts_transformers(self):
+        from ovos_plugin_manager.templates.transformers import TTSTransformer
+
+        class UpperTransformer(TTSTransformer):
+            cacheable = True
+
+            def __init__(self):
+                super().__init__("upper", config={})
+                self.calls = 0
+
+            def transform(self, wav_file, context=None):
+                self.calls += 1
+                out = wav_file + ".upper.wav"
+                with open(wav_file) as f, open(out, "w") as o:
+                    o.write(f.read().upper())
+                context["upper"] = True
+                return out, context
+
+        tts = DummyBatchTTS(self.config)
+        tts._plugin_id = "dummy-batch"
+        tts.tts_transformers = [UpperTransformer()]
+        # transformed audio outlives the process, start from a clean cache
+        TTSContext("dummy-batch", "en-US", "default", {"lang": "en-US"}).get_cache().clear()
+        for _ in range(2):
+            m = Message("speak", context={"session": Session("123", lang="en-US").serialize()})
+            tts._execute("hello", "123", False, message=m)
+            path, _, _, _, message = tts.queue.get_nowait()
+            with open(path) as f:
+                self.assertEqual(f.read(), "HELLO")
+            self.assertTrue(message.context["upper"])
+        # the transformed audio was reused
+        self.assertEqual(tts.tts_transformers[0].calls, 1)
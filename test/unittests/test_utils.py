@@ -1,10 +1,13 @@
 import shutil
+import tempfile
+import time
 import unittest
-from os import makedirs
+from os import makedirs, utime
 
 from os.path import join, dirname, isfile
 from copy import deepcopy, copy
 from unittest.mock import patch, Mock
+from queue import Empty
 
 _MOCK_CONFIG = {
     "lang": "global",
@@ -699,6 +702,48 @@ class TestConfigUtils(unittest.TestCase):
         # TODO
 
 
+class TestKwargsFilter(unittest.TestCase):
+    def test_get_accepted_kwargs(self):
+        import gc
+        import weakref
+        from ovos_plugin_manager.utils import get_accepted_kwargs, _SIGNATURES
+
+        class Plugin:
+            def get_tts(self, sentence, wav_file, lang=None):
+                pass
+
+            @classmethod
+            def create(cls, config=None):
+                pass
+
+        a, b = Plugin(), Plugin()
+        params = get_accepted_kwargs(a.get_tts)
+        # self is bound, it can not be passed as a kwarg
+        self.assertEqual(params, {"sentence", "wav_file", "lang"})
+        self.assertEqual(get_accepted_kwargs(Plugin.get_tts), {"self", "sentence", "wav_file", "lang"})
+        self.assertEqual(get_accepted_kwargs(Plugin.create), {"config"})
+        # bound methods of other instances share the cached signature
+        self.assertIs(get_accepted_kwargs(b.get_tts), params)
+        self.assertEqual(get_accepted_kwargs(len), {"obj"})
+
+        # the cache does not keep functions alive
+        func = weakref.ref(Plugin.get_tts)
+        self.assertIn(func(), _SIGNATURES)
+        del a, b, Plugin
+        gc.collect()
+        self.assertIsNone(func())
+
+    def test_filter_kwargs(self):
+        from ovos_plugin_manager.utils import filter_kwargs
+
+        def get_tts(sentence, wav_file, lang=None, voice=None):
+            pass
+
+        kwargs = {"lang": "en-US", "voice": "v", "message": None, "sentence": "s"}
+        self.assertEqual(filter_kwargs(get_tts, kwargs, exclude=("sentence",)),
+                         {"lang": "en-US", "voice": "v"})
+
+
 class TestTTSCacheUtils(unittest.TestCase):
     def test_hash_sentence(self):
         from ovos_plugin_manager.utils.tts_cache import hash_sentence
@@ -713,6 +758,24 @@ class TestTTSCacheUtils(unittest.TestCase):
         hashed = hash_sentence(test_sentence)
         self.assertIsInstance(hashed, str)
 
+    def test_hash_sentence_algo(self):
+        from ovos_plugin_manager.utils.tts_cache import hash_sentence
+        self.assertEqual(hash_sentence("hello"), hash_sentence("hello", "md5"))
+        hashed = hash_sentence("hello", "blake2b")
+        self.assertEqual(len(hashed), 20)
+        self.assertNotEqual(hashed, hash_sentence("hello"))
+
+    def test_normalize_sentence(self):
+        from ovos_plugin_manager.utils.tts_cache import normalize_sentence
+        self.assertEqual(normalize_sentence("  hello \n world  "), "hello world")
+        # NFD and NFC spellings of the same text
+        self.assertEqual(normalize_sentence("cafe\u0301"), "caf\u00e9")
+        self.assertEqual(normalize_sentence('say <break  time = "1s" /> now'),
+                         'say <break time="1s"/> now')
+        self.assertEqual(normalize_sentence("Hello", casefold=True), "hello")
+        self.assertEqual(normalize_sentence("Hello"), "Hello")
+        self.assertEqual(normalize_sentence(" a  b ", whitespace=False), " a  b ")
+
     def test_hash_from_path(self):
         from ovos_plugin_manager.utils.tts_cache import hash_from_path
         from pathlib import Path
@@ -777,6 +840,556 @@ class TestTTSCacheUtils(unittest.TestCase):
         # TODO
 
 
+class TestTTSCacheManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _make_cache(self, name):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        from pathlib import Path
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, name, "persist")},
+                                  name, "wav")
+        cache.temporary_cache_dir = Path(self.tmp, name, "tmp")
+        makedirs(cache.temporary_cache_dir)
+        return cache
+
+    @staticmethod
+    def _add(cache, sha, size):
+        audio = cache.define_audio_file(sha)
+        with open(audio.path, "wb") as f:
+            f.write(b"0" * size)
+        cache.cached_sentences[sha] = (audio, None)
+        cache.track(sha)
+
+    def test_global_budget(self):
+        from ovos_plugin_manager.utils.tts_cache import TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, background=False)
+        manager.max_bytes = 1000
+        a = manager.register("a", self._make_cache("a"))
+        b = manager.register("b", self._make_cache("b"))
+
+        self._add(b, "b1", 300)
+        self._add(a, "a1", 300)
+        self._add(a, "a2", 300)
+        self.assertEqual(manager.bytes_used, 900)
+        self.assertEqual(manager.get_stats()["evictions"], 0)
+
+        # "a" is over its fair share, its oldest entry goes even if "b1" is older
+        self._add(a, "a3", 300)
+        self.assertNotIn("a1", a.cached_sentences)
+        self.assertIn("b1", b.cached_sentences)
+        self.assertEqual(manager.bytes_used, 900)
+
+        a.touch("a2")
+        stats = manager.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["caches"]["a"]["bytes_used"], 600)
+
+    def test_background_eviction(self):
+        import time
+        from ovos_plugin_manager.utils.tts_cache import TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, rate_limit=0)
+        manager.max_bytes = 1000
+        a = manager.register("a", self._make_cache("a"))
+        for i in range(4):
+            self._add(a, f"a{i}", 300)
+        # insert returns without waiting for the eviction
+        for _ in range(100):
+            if manager.bytes_used <= 1000:
+                break
+            time.sleep(0.01)
+        self.assertEqual(manager.bytes_used, 900)
+        self.assertNotIn("a0", a.cached_sentences)
+        self.assertIn("a3", a.cached_sentences)
+
+    def test_cache_hits_protected(self):
+        from ovos_plugin_manager.utils.tts_cache import TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, background=False)
+        manager.max_bytes = 1000
+        a = manager.register("a", self._make_cache("a"))
+        self._add(a, "a1", 300)
+        self._add(a, "a2", 300)
+        self._add(a, "a3", 300)
+        # a1 is about to be played, the next least recently used entry goes instead
+        audio, _ = a.lookup("a1")
+        a._last_used["a1"] = 0
+        self._add(a, "a4", 300)
+        self.assertIn("a1", a.cached_sentences)
+        self.assertNotIn("a2", a.cached_sentences)
+        self.assertTrue(audio.exists())
+        self.assertIsNone(a.lookup("a2"))
+
+    def test_curate_low_disk(self):
+        from ovos_plugin_manager.utils.tts_cache import TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, background=False)
+        a = manager.register("a", self._make_cache("a"))
+        self._add(a, "a1", 300)
+        self._add(a, "a2", 300)
+        self._add(a, "a3", 300)
+        orphan = join(a.temporary_cache_dir, "orphan.wav")
+        with open(orphan, "wb") as f:
+            f.write(b"0" * 300)
+        audio, _ = a.lookup("a1")
+        a._last_used["a1"] = 0
+
+        # curation evicts through the index and skips the audio about to be played
+        with patch("ovos_plugin_manager.utils.tts_cache._bytes_to_free",
+                   return_value=500):
+            a.curate()
+        self.assertIn("a1", a.cached_sentences)
+        self.assertTrue(audio.exists())
+        self.assertNotIn("a2", a.cached_sentences)
+        self.assertNotIn("a3", a.cached_sentences)
+        self.assertEqual(a.bytes_used, 300)
+        self.assertEqual(a.stats["evictions"], 2)
+        # recent files unknown to the index may be a synthesis in flight
+        self.assertTrue(isfile(orphan))
+
+        # old files unknown to the index are deleted once the index is exhausted
+        utime(orphan, (0, 0))
+        with patch("ovos_plugin_manager.utils.tts_cache._bytes_to_free",
+                   return_value=200):
+            a.curate()
+        self.assertFalse(isfile(orphan))
+        self.assertIn("a1", a.cached_sentences)
+
+    def test_unlimited_budget(self):
+        from ovos_plugin_manager.utils.tts_cache import TTSCacheManager
+        manager = TTSCacheManager(max_mb=0, background=False)
+        a = manager.register("a", self._make_cache("a"))
+        for i in range(5):
+            self._add(a, f"a{i}", 1000)
+        self.assertEqual(len(a.cached_sentences), 5)
+
+
+class TestUtteranceCounter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = join(self.tmp, "counts.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_persisted(self):
+        from ovos_plugin_manager.utils.tts_cache import UtteranceCounter
+        counter = UtteranceCounter(self.path)
+        counter.increment("a")
+        self.assertEqual(counter.increment("a"), 2)
+        counter.save()
+        self.assertEqual(UtteranceCounter(self.path).get("a"), 2)
+
+    def test_decay(self):
+        from ovos_plugin_manager.utils.tts_cache import UtteranceCounter
+        counter = UtteranceCounter(half_life_days=1)
+        counter.increment("a")
+        counter.increment("a")
+        counter._counts["a"][1] -= 86400
+        self.assertEqual(counter.get("a"), 1)
+        self.assertEqual(counter.increment("a"), 2)
+
+    def test_decay_within_a_day(self):
+        from ovos_plugin_manager.utils.tts_cache import UtteranceCounter
+        counter = UtteranceCounter(half_life_days=1)
+        counter.increment("a")
+        counter._counts["a"][1] -= 43200
+        self.assertAlmostEqual(counter.get("a"), 0.5 ** 0.5, places=5)
+        self.assertAlmostEqual(counter.increment("a"), 1 + 0.5 ** 0.5, places=5)
+        # quick successive uses are not decayed below their count
+        counter = UtteranceCounter(half_life_days=1)
+        for _ in range(3):
+            counter.increment("b")
+        self.assertGreaterEqual(counter.get("b"), 3)
+
+    def test_bounded(self):
+        from ovos_plugin_manager.utils.tts_cache import UtteranceCounter
+        counter = UtteranceCounter(max_entries=10)
+        for _ in range(3):
+            counter.increment("frequent")
+        for i in range(20):
+            counter.increment(str(i))
+        self.assertLessEqual(len(counter), 10)
+        self.assertEqual(counter.get("frequent"), 3)
+
+
+class TestTTSCachePromotion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_promote_in_place(self):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        from pathlib import Path
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist"),
+                                   "persist_cache": True, "persist_thresh": 3},
+                                  "test-promote", "wav")
+        cache.temporary_cache_dir = Path(self.tmp, "tmp")
+        makedirs(cache.temporary_cache_dir)
+
+        # first use, synthesized into the temporary cache
+        audio = cache.define_audio_file("sha")
+        self.assertEqual(audio.path.parent, cache.temporary_cache_dir)
+        pho = cache.define_phoneme_file("sha")
+        self.assertEqual(pho.path.parent, cache.temporary_cache_dir)
+        audio.save(b"audio")
+        pho.save("phonemes")
+        cache.cached_sentences["sha"] = (audio, pho)
+        cache.track("sha")
+
+        cache.touch("sha")
+        self.assertTrue(cache.is_temporary("sha"))
+        # third use promotes the existing files without synthesizing again
+        cache.touch("sha")
+        self.assertFalse(cache.is_temporary("sha"))
+        self.assertEqual(audio.path.parent, cache.persistent_cache_dir)
+        self.assertEqual(audio.load(), b"audio")
+        self.assertEqual(pho.load(), "phonemes")
+        self.assertIn("sha", cache)
+        self.assertEqual(cache.bytes_used, 0)
+
+        cache.curate()
+        self.assertTrue(isfile(join(self.tmp, "persist", "utterance_counts.json")))
+
+    def test_promote_rollback(self):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        from pathlib import Path
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist")},
+                                  "test-promote-rollback", "wav")
+        cache.temporary_cache_dir = Path(self.tmp, "tmp")
+        makedirs(cache.temporary_cache_dir)
+        audio = cache.define_audio_file("sha")
+        pho = cache.define_phoneme_file("sha")
+        audio.save(b"audio")
+        pho.save("phonemes")
+        cache.cached_sentences["sha"] = (audio, pho)
+        cache.track("sha")
+        size = cache.bytes_used
+
+        # the second file fails to move, the first one is moved back
+        real_move = shutil.move
+        moves = []
+
+        def _move(src, dst):
+            moves.append(src)
+            if len(moves) == 2:
+                raise OSError("disk full")
+            return real_move(src, dst)
+
+        with patch("ovos_plugin_manager.utils.tts_cache.shutil.move", side_effect=_move):
+            self.assertFalse(cache.promote("sha"))
+        self.assertTrue(cache.is_temporary("sha"))
+        self.assertEqual(audio.load(), b"audio")
+        self.assertTrue(pho.exists())
+        self.assertEqual(cache.bytes_used, size)
+        self.assertEqual(list(Path(self.tmp, "persist").glob("sha*")), [])
+
+        self.assertTrue(cache.promote("sha"))
+        self.assertEqual(pho.path.parent, cache.persistent_cache_dir)
+        self.assertEqual(cache.bytes_used, 0)
+
+    def test_viseme_file(self):
+        from ovos_plugin_manager.utils.tts_cache import VisemeFile, PhonemeFile
+        visemes = [("4", 0.2), ("0", 0.35), ("6", 1.0)]
+        vis = VisemeFile(self.tmp, "sha")
+        self.assertTrue(vis.save(visemes))
+        self.assertEqual(VisemeFile(self.tmp, "sha").load(), visemes)
+        # multi char codes can not be packed
+        self.assertFalse(VisemeFile(self.tmp, "other").save([("AA", 0.1)]))
+        self.assertFalse(VisemeFile(self.tmp, "other").exists())
+        # stored next to the phonemes they are derived from
+        pho = PhonemeFile(self.tmp, "sha")
+        self.assertEqual(pho.visemes.path, vis.path)
+
+    def test_rename(self):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        from pathlib import Path
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist")},
+                                  "test-rename", "wav")
+        cache.temporary_cache_dir = Path(self.tmp, "tmp")
+        makedirs(cache.temporary_cache_dir)
+        audio = cache.define_audio_file("old")
+        audio.save(b"audio")
+        cache.cached_sentences["old"] = (audio, None)
+        cache.track("old")
+
+        cache.rename("old", "new")
+        self.assertNotIn("old", cache)
+        self.assertIn("new", cache)
+        self.assertEqual(audio.path, cache.temporary_cache_dir.joinpath("new.wav"))
+        self.assertEqual(audio.load(), b"audio")
+        self.assertFalse(isfile(join(self.tmp, "tmp", "old.wav")))
+        self.assertEqual(cache.bytes_used, len(b"audio"))
+        cache.evict("new")
+        self.assertEqual(cache.bytes_used, 0)
+
+    def test_rename_read_only(self):
+        from ovos_plugin_manager.utils.tts_cache import TextToSpeechCache
+        cache = TextToSpeechCache({"preloaded_cache": join(self.tmp, "persist")},
+                                  "test-rename-ro", "wav")
+        audio = cache.define_audio_file("old", persistent=True)
+        audio.save(b"audio")
+        cache.cached_sentences["old"] = (audio, None)
+
+        with patch("ovos_plugin_manager.utils.tts_cache.os.replace",
+                   side_effect=PermissionError("read-only")):
+            self.assertFalse(cache.rename("old", "new"))
+        # files stay where they are, served under both keys
+        self.assertIn("old", cache)
+        self.assertIn("new", cache)
+        self.assertEqual(cache.cached_sentences["new"][0].load(), b"audio")
+        self.assertTrue(isfile(join(self.tmp, "persist", "old.wav")))
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    def test_read_write(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        buf = AudioRingBuffer(8)
+        buf.write(b"abc")
+        buf.write(b"de")
+        # pending chunks are coalesced into a single view
+        view = buf.read()
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes(view), b"abcde")
+        self.assertEqual(buf.free, 3)  # view still held
+        buf.release()
+        self.assertEqual(buf.free, 8)
+        buf.write(b"fghij")  # wraps around
+        self.assertEqual(bytes(buf.read()), b"fgh")
+        self.assertEqual(bytes(buf.read(max_bytes=1)), b"i")
+        self.assertEqual(bytes(buf.read()), b"j")
+        self.assertEqual(len(buf.read(timeout=0.01)), 0)
+        buf.close()
+        self.assertIsNone(buf.read())
+        self.assertFalse(buf.write(b"x"))
+
+    def test_invalid_policy(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        with self.assertRaises(ValueError):
+            AudioRingBuffer(8, overflow="grow")
+
+    def test_block(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        from threading import Thread
+        buf = AudioRingBuffer(4, overflow="block")
+        self.assertFalse(buf.write(b"abcdef", timeout=0.01))
+        self.assertEqual(buf.dropped, 2)
+
+        buf = AudioRingBuffer(4, overflow="block")
+        t = Thread(target=buf.write, args=(bytes(range(20)),))
+        t.start()
+        received = b""
+        while len(received) < 20:
+            received += bytes(buf.read())
+        t.join()
+        self.assertEqual(received, bytes(range(20)))
+        self.assertEqual(buf.dropped, 0)
+
+        # a stalled reader does not hang the writer forever
+        buf = AudioRingBuffer(4, overflow="block", max_wait=0.05)
+        start = time.monotonic()
+        self.assertFalse(buf.write(b"abcdef"))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(buf.dropped, 2)
+        buf.close()
+        self.assertFalse(buf.write(b"gh"))
+
+    def test_drop_oldest(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        buf = AudioRingBuffer(6, overflow="drop_oldest")
+        buf.write(b"abcd")
+        buf.write(b"efgh")
+        self.assertEqual(buf.dropped, 2)
+        self.assertEqual(bytes(buf.read()), b"cdef")
+
+        # the view held by the reader is not overwritten
+        buf = AudioRingBuffer(6, overflow="drop_oldest")
+        buf.write(b"ab")
+        view = buf.read()
+        buf.write(b"cdef")
+        buf.write(b"gh")
+        self.assertEqual(bytes(view), b"ab")
+        self.assertEqual(buf.dropped, 2)
+        received = b""
+        while buf.pending:
+            received += bytes(buf.read())
+        self.assertEqual(received, b"efgh")
+
+    def test_coalesce(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        buf = AudioRingBuffer(4, overflow="coalesce", bytes_per_second=4)
+        self.assertTrue(buf.write(b"abcd"))
+        buf.write(b"ef")
+        buf.write(b"ghij")  # spill holds at most capacity bytes
+        self.assertEqual(buf.dropped, 2)
+        self.assertEqual(buf.lag, 2.0)
+        received = b""
+        while buf.pending:
+            received += bytes(buf.read())
+        self.assertEqual(received, b"abcdghij")
+        self.assertEqual(buf.max_lag, 2.0)
+
+    def test_queue_compat(self):
+        from ovos_plugin_manager.utils.ring_buffer import AudioRingBuffer
+        buf = AudioRingBuffer(8)
+        buf.put(b"ab")
+        buf.put(None)
+        self.assertEqual(buf.get(), b"ab")
+        buf.task_done()
+        self.assertIsNone(buf.get())
+
+        buf = AudioRingBuffer(8)
+        with self.assertRaises(Empty):
+            buf.get(timeout=0.01)
+        with self.assertRaises(Empty):
+            buf.get(block=False)
+
+
+class TestHedging(unittest.TestCase):
+    def test_circuit_breaker(self):
+        from ovos_plugin_manager.utils.hedging import CircuitBreaker
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        time.sleep(0.06)
+        # single trial request, failing re-opens the circuit
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_fast_primary(self):
+        from ovos_plugin_manager.utils.hedging import HedgedRequest
+        hedge = HedgedRequest(default_delay=1.0)
+        fallback = Mock()
+        self.assertEqual(hedge(lambda: "primary", fallback), "primary")
+        fallback.assert_not_called()
+
+    def test_slow_primary(self):
+        from ovos_plugin_manager.utils.hedging import HedgedRequest
+
+        def slow():
+            time.sleep(0.3)
+            return "primary"
+
+        hedge = HedgedRequest(default_delay=0.02)
+        start = time.monotonic()
+        self.assertEqual(hedge(slow, lambda: "fallback"), "fallback")
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(hedge.stats["hedged"], 1)
+
+    def test_hung_primaries(self):
+        from threading import Event
+        from ovos_plugin_manager.utils.hedging import HedgedRequest, CircuitBreaker
+        release = Event()
+
+        hedge = HedgedRequest(default_delay=0.05, max_workers=2,
+                              breaker=CircuitBreaker(failure_threshold=3))
+        start = time.monotonic()
+        # more hung primaries than workers, the fallback still answers
+        for _ in range(5):
+            self.assertEqual(hedge(release.wait, lambda: "fallback"), "fallback")
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(hedge.breaker.state, CircuitBreaker.OPEN)
+
+        # a hung primary and a failed fallback time out
+        hedge = HedgedRequest(default_delay=0.01, timeout=0.1)
+
+        def broken():
+            raise ConnectionError("down")
+
+        with self.assertRaises(TimeoutError):
+            hedge(release.wait, broken)
+        release.set()
+
+    def test_failing_primary_opens_circuit(self):
+        from ovos_plugin_manager.utils.hedging import HedgedRequest, CircuitBreaker
+
+        def broken():
+            raise ConnectionError("down")
+
+        hedge = HedgedRequest(breaker=CircuitBreaker(failure_threshold=2))
+        primary = Mock(side_effect=broken)
+        for _ in range(3):
+            self.assertEqual(hedge(primary, lambda: "fallback"), "fallback")
+        # circuit opened after two failures, the primary is not called anymore
+        self.assertEqual(primary.call_count, 2)
+
+    def test_hedge_delay_percentile(self):
+        from ovos_plugin_manager.utils.hedging import HedgedRequest
+        hedge = HedgedRequest(percentile=90, default_delay=5.0, min_samples=10)
+        self.assertEqual(hedge.hedge_delay, 5.0)
+        for i in range(10):
+            hedge._record_latency(i / 10)
+        self.assertEqual(hedge.hedge_delay, 0.9)
+
+
+class TestSTTBenchmark(unittest.TestCase):
+    def test_error_rates(self):
+        from ovos_plugin_manager.utils.stt_benchmark import word_error_rate, char_error_rate
+        self.assertEqual(word_error_rate("Hello, world!", "hello world"), 0.0)
+        self.assertEqual(word_error_rate("turn on the light", "turn the lights"), 0.5)
+        self.assertEqual(char_error_rate("abcd", "abed"), 0.25)
+        self.assertEqual(word_error_rate("", ""), 0.0)
+
+    def test_percentile(self):
+        from ovos_plugin_manager.utils.stt_benchmark import percentile
+        values = list(range(1, 21))
+        self.assertEqual(percentile(values, 50), 10)
+        self.assertEqual(percentile(values, 95), 19)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_peak_rss_children(self):
+        import subprocess
+        import sys
+        from ovos_plugin_manager.utils.stt_benchmark import peak_rss_mb
+        # memory of child processes that exited and were waited for
+        subprocess.run([sys.executable, "-c", "b = bytearray(200 * 1024 * 1024)"], check=True)
+        self.assertGreater(peak_rss_mb(children=True), 150)
+
+    def test_benchmark(self):
+        import wave
+        from ovos_plugin_manager.utils.stt_benchmark import benchmark_stt
+        tmp = tempfile.mkdtemp()
+        try:
+            for name, ref in (("a", "hello world"), ("b", "good morning")):
+                with wave.open(join(tmp, f"{name}.wav"), "wb") as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(16000)
+                    f.writeframes(b"\0\0" * 16000)
+                with open(join(tmp, f"{name}.txt"), "w") as f:
+                    f.write(ref)
+            # no reference transcript, skipped
+            shutil.copy(join(tmp, "a.wav"), join(tmp, "c.wav"))
+
+            stt = Mock()
+            stt.transcribe.return_value = [("hello world", 1.0)]
+            report = benchmark_stt(stt, tmp, "en-US", workers=2)
+            summary = report["summary"]
+            self.assertEqual(summary["files"], 2)
+            self.assertAlmostEqual(summary["audio_seconds"], 2.0)
+            self.assertEqual(summary["wer"], 0.5)
+            self.assertEqual([r["wer"] for r in report["results"]], [0.0, 1.0])
+            self.assertGreaterEqual(summary["latency_p95"], summary["latency_p50"])
+            self.assertGreater(summary["peak_rss_mb"], 0)
+            self.assertEqual(summary["peak_rss_scope"], "self")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
 class TestUiUtils(unittest.TestCase):
     def test_hash_dict(self):
         from ovos_plugin_manager.utils.ui import hash_dict
@@ -2,6 +2,7 @@ import unittest
 from copy import copy, deepcopy
 from unittest.mock import patch, Mock
 
+from ovos_plugin_manager.templates.vad import VADEngine
 from ovos_plugin_manager.utils import PluginTypes, PluginConfigTypes
 
 _TEST_CONFIG = {
@@ -27,9 +28,200 @@ _FALLBACK_CONFIG = {
 }
 
 
+class DummyVAD(VADEngine):
+    """frames starting with a 0 byte are silence"""
+
+    def is_silence(self, chunk):
+        return chunk[0] == 0
+
+
+def _frames(pattern, frame_size):
+    """one frame per character, "1" for speech, "0" for silence"""
+    return b"".join(bytes([int(c)]) * frame_size for c in pattern)
+
+
 class TestVADTemplate(unittest.TestCase):
-    from ovos_plugin_manager.templates.vad import VADEngine
-    # TODO
+    def setUp(self):
+        # 100 byte frames, 5 frames of padding
+        self.vad = DummyVAD({"padding_duration_ms": 250, "frame_duration_ms": 50,
+                             "thresh": 0.5}, sample_rate=1000)
+        self.n = self.vad.frame_size
+
+    def test_extract_speech(self):
+        self.assertEqual(self.n, 100)
+        audio = _frames("0000" + "0111" + "1111" + "0000" + "0000", self.n)
+        speech = self.vad.extract_speech(audio)
+        # starts with the padding window that triggered, ends once 3/5 frames are unvoiced
+        self.assertEqual(speech, audio[3 * self.n:15 * self.n])
+
+    def test_no_speech(self):
+        self.assertIsNone(self.vad.extract_speech(_frames("0" * 20, self.n)))
+        # speech never ends
+        self.assertIsNone(self.vad.extract_speech(_frames("1" * 20, self.n)))
+        # partial frames are ignored
+        self.assertIsNone(self.vad.extract_speech(b"\1" * (self.n - 1)))
+
+
+class DummyBatchVAD(DummyVAD):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def is_silence(self, chunk):
+        raise AssertionError("frames should be scored in batches")
+
+    def is_silence_batch(self, frames):
+        self.batches.append(len(frames))
+        return [frame[0] == 0 for frame in frames]
+
+
+class TestVADBatch(unittest.TestCase):
+    def test_default_batch(self):
+        vad = DummyVAD({}, sample_rate=16000)
+        self.assertFalse(vad.supports_batch)
+        self.assertEqual(vad.is_silence_batch([b"\0\0", b"\1\1"]), [True, False])
+        self.assertEqual(vad.speech_probability(b"\1\1"), 1.0)
+        self.assertEqual(vad.speech_probability_batch([b"\0\0", b"\1\1"]), [0.0, 1.0])
+
+    def test_extract_speech_uses_batch(self):
+        config = {"padding_duration_ms": 250, "frame_duration_ms": 50,
+                  "thresh": 0.5, "batch_size": 8}
+        vad = DummyBatchVAD(config, sample_rate=1000)
+        self.assertTrue(vad.supports_batch)
+        audio = _frames("0000" + "0111" + "1111" + "0000" + "0000", vad.frame_size)
+        expected = DummyVAD(config, sample_rate=1000).extract_speech(audio)
+        self.assertEqual(vad.extract_speech(audio), expected)
+        # stops scoring once speech ended
+        self.assertEqual(vad.batches, [8, 8])
+
+
+class TestVADSegmenter(unittest.TestCase):
+    def setUp(self):
+        self.config = {"padding_duration_ms": 250, "frame_duration_ms": 50, "thresh": 0.5}
+
+    def test_matches_extract_speech(self):
+        from ovos_plugin_manager.templates.vad import VADEvent
+        vad = DummyVAD(self.config, sample_rate=1000)
+        audio = _frames("0000" + "0111" + "1111" + "0000" + "0000", vad.frame_size)
+        events = []
+        # odd sized chunks, frames span several chunks
+        for i in range(0, len(audio), 37):
+            events += vad.feed(audio[i:i + 37])
+        self.assertEqual([e.event for e in events], [VADEvent.SPEECH_START, VADEvent.SPEECH_END])
+        self.assertAlmostEqual(events[0].timestamp, 0.15)
+        self.assertAlmostEqual(events[1].timestamp, 0.75)
+        self.assertEqual(events[1].audio, DummyVAD(self.config, sample_rate=1000).extract_speech(audio))
+
+    def test_multiple_segments(self):
+        vad = DummyVAD(self.config, sample_rate=1000)
+        pattern = "00000111110000000" * 3
+        events = vad.feed(_frames(pattern, vad.frame_size))
+        self.assertEqual(len(events), 6)
+        self.assertFalse(vad._segmenter.in_speech)
+
+    def test_max_segment(self):
+        vad = DummyVAD(dict(self.config, max_segment_ms=500), sample_rate=1000)
+        events = vad.feed(_frames("1" * 25, vad.frame_size))
+        ends = [e for e in events if e.event == "speech_end"]
+        self.assertEqual(len(ends), 2)
+        self.assertTrue(all(len(e.audio) == 10 * vad.frame_size for e in ends))
+
+    def test_reset_stream(self):
+        vad = DummyVAD(self.config, sample_rate=1000)
+        self.assertEqual(len(vad.feed(_frames("11111", vad.frame_size))), 1)
+        self.assertTrue(vad._segmenter.in_speech)
+        vad.reset_stream()
+        self.assertFalse(vad._segmenter.in_speech)
+
+
+class CountingVAD(VADEngine):
+    """16 bit audio, frames above 1000 rms are speech, counts the frames it scores"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scored = 0
+
+    def is_silence(self, chunk):
+        import numpy as np
+        self.scored += 1
+        samples = np.frombuffer(chunk, dtype="<i2").astype(np.float32)
+        return np.sqrt(np.mean(samples * samples)) < 1000
+
+
+def _pcm_frames(pattern, frame_size):
+    """one 16 bit frame per character, "1" loud speech, "n" quiet hiss, "0" digital silence"""
+    import numpy as np
+    samples = frame_size // 2
+    frames = {"1": np.full(samples, 3000, dtype="<i2"),
+              "n": np.tile(np.array([120, -120], dtype="<i2"), samples // 2),
+              "0": np.zeros(samples, dtype="<i2")}
+    return b"".join(frames[c].tobytes() for c in pattern)
+
+
+class TestEnergyGate(unittest.TestCase):
+    def setUp(self):
+        self.config = {"padding_duration_ms": 250, "frame_duration_ms": 50,
+                       "thresh": 0.5, "batch_size": 8}
+
+    def test_disabled_by_default(self):
+        vad = CountingVAD(self.config, sample_rate=1000)
+        self.assertIsNone(vad.energy_gate)
+        self.assertEqual(vad.get_stats(), {})
+        pattern = "0000n111111111nn0000"
+        list(vad._speech_flags(_pcm_frames(pattern, vad.frame_size)))
+        self.assertEqual(vad.scored, len(pattern))
+
+    def test_gated_frames_skip_plugin(self):
+        pattern = "0000n111111111nn0000"
+        plain = CountingVAD(self.config, sample_rate=1000)
+        vad = CountingVAD(dict(self.config, energy_gate={"min_rms": 200}), sample_rate=1000)
+        audio = _pcm_frames(pattern, vad.frame_size)
+        self.assertEqual(list(vad._speech_flags(audio)), list(plain._speech_flags(audio)))
+        self.assertEqual(vad.extract_speech(audio), plain.extract_speech(audio))
+        # only the loud frames reached the plugin
+        self.assertEqual(vad.scored, 2 * pattern.count("1"))
+
+        stats = vad.get_stats()
+        self.assertEqual(stats["frames"], 2 * len(pattern))
+        self.assertAlmostEqual(stats["energy_gate_pass_rate"], pattern.count("1") / len(pattern))
+        self.assertAlmostEqual(stats["vad_pass_rate"], 1.0)
+
+    def test_noise_floor_adapts(self):
+        vad = CountingVAD(dict(self.config, energy_gate={"min_rms": 200, "adaptation": 0.5}),
+                          sample_rate=1000)
+        self.assertAlmostEqual(vad.energy_gate.threshold, 200)
+        # steady hiss below the threshold is gated and raises the floor
+        list(vad._speech_flags(_pcm_frames("n" * 80, vad.frame_size)))
+        self.assertEqual(vad.scored, 0)
+        self.assertAlmostEqual(vad.energy_gate.noise_floor, 120, delta=1)
+        # speech never moves the floor
+        list(vad._speech_flags(_pcm_frames("1" * 80, vad.frame_size)))
+        self.assertAlmostEqual(vad.energy_gate.noise_floor, 120, delta=1)
+
+    def test_speech_first(self):
+        # audio starting with speech does not seed the floor at speech level
+        pattern = ("1" * 30 + "0" * 20) * 3
+        plain = CountingVAD(self.config, sample_rate=1000)
+        vad = CountingVAD(dict(self.config, energy_gate=True), sample_rate=1000)
+        audio = _pcm_frames(pattern, vad.frame_size)
+        self.assertEqual(list(vad._speech_flags(audio)), list(plain._speech_flags(audio)))
+        self.assertEqual(vad.extract_speech(audio), plain.extract_speech(audio))
+        self.assertIsNotNone(vad.extract_speech(audio))
+        self.assertLess(vad.energy_gate.noise_floor, 100)
+
+    def test_near_threshold_passes(self):
+        import numpy as np
+        from ovos_plugin_manager.templates.vad import EnergyGate
+        gate = EnergyGate({"min_rms": 200})
+        frames = b"".join(np.full(50, v, dtype="<i2").tobytes() for v in (150, 110, 0))
+        # voiced frames within twice the headroom reach the plugin
+        self.assertEqual(gate.filter(frames, 3), [True, True, False])
+
+    def test_feed(self):
+        vad = CountingVAD(dict(self.config, energy_gate=True), sample_rate=1000)
+        events = vad.feed(_pcm_frames("00000111110000000", vad.frame_size))
+        self.assertEqual(len(events), 2)
+        self.assertEqual(vad.scored, 5)
 
 
 class TestVAD(unittest.TestCase):